@@ -0,0 +1,514 @@
+from contextlib import contextmanager
+
+from file_management.history import HistoryEntry, InventoryHistory
+from file_management.lookup_file import LookupPublisher
+from file_management.storage import JsonFileStore
+from modules.utils import build_barcode_index, natural_sort_key
+
+
+class InventoryManager:
+    """In-memory inventory model backed by a store on disk, with item counts kept up to date."""
+
+    def __init__(self, json_file_path, store=None, lookup_path=None):
+        self.json_file_path = json_file_path
+        self.store = store or JsonFileStore(json_file_path)
+        # Read-only lookup file for search-only stations, republished after every write
+        self.lookup_publisher = LookupPublisher(lookup_path) if lookup_path else None
+        self.data = None
+        self.load_errors = []  # structure problems found by the last load
+        self._loaded_mtime = None
+        self._changed_locations = set()  # locations edited since the last save
+        self._snapshot_changes = None  # locations edited since the last snapshot, None if unknown
+        self.history = InventoryHistory()  # undo/redo of changes made since the last load
+        self._batch = None  # entries collected by batch(), recorded as one step
+
+        # Aggregate statistics, updated on every change instead of recomputed
+        self.index = {}  # barcode -> (location, shelf, nested shelf)
+        # barcode -> paths of the other copies, for duplicate barcodes kept by the loader
+        self._duplicate_paths = {}
+        self.order_lines = {}  # order number -> set of line numbers in the index
+        self.location_counts = {}  # location -> items
+        self.shelf_counts = {}  # (location, shelf) -> items
+        self.total_items = 0
+        self.total_shelves = 0
+        self.total_nested_shelves = 0
+
+    # ----- Loading and saving -----
+
+    def load(self, progress_callback=None):
+        """Load the inventory (creating it if missing) and rebuild the statistics once.
+
+        Raises InventoryFormatError if the file is not valid JSON.
+        """
+        if not self.store.exists():
+            self.reset()
+            return self.data
+        return self.apply_load_result(self.read_file(progress_callback))
+
+    def read_file(self, progress_callback=None):
+        """Stream and validate the stored inventory without touching the current model (safe off the UI thread)."""
+        return self.store.read(progress_callback)
+
+    def apply_load_result(self, result):
+        """Replace the current model with a result from read_file."""
+        self.data = result.data
+        self.load_errors = result.errors
+        self._loaded_mtime = result.mtime
+        self._changed_locations = set()
+        self._snapshot_changes = None
+        self.history.clear()
+        self._rebuild_stats(result.index)
+        self._publish_lookup()
+        return self.data
+
+    def ensure_loaded(self):
+        """Return the current data, reloading only if the store was changed outside this model."""
+        if self.data is None:
+            return self.load()
+        if self.store.exists() and self.store.mtime() != self._loaded_mtime:
+            return self.load()
+        return self.data
+
+    def save(self):
+        """Write the locations changed since the last save back to the store."""
+        self.store.write(self.data, self._changed_locations)
+        self._changed_locations = set()
+        self._loaded_mtime = self.store.mtime()
+        self._publish_lookup()
+
+    def reset(self):
+        """Reset the inventory to the initial empty structure."""
+        self.replace_data({"locations": {}})
+
+    def replace_data(self, data):
+        """Replace the whole inventory (e.g. when restoring a snapshot) and write it to the store."""
+        self.data = data
+        self.load_errors = []
+        self._rebuild_stats()
+        self.history.clear()
+        self.store.write(self.data)
+        self._changed_locations = set()
+        self._snapshot_changes = None
+        self._loaded_mtime = self.store.mtime()
+        self._publish_lookup()
+
+    def take_snapshot_changes(self):
+        """Return the locations changed since the last snapshot (None if unknown) and start tracking anew."""
+        changed, self._snapshot_changes = self._snapshot_changes, set()
+        return changed
+
+    def invalidate_snapshot_changes(self):
+        """Forget the tracked changes so the next snapshot is a full one (e.g. after a failed write)."""
+        self._snapshot_changes = None
+
+    def switch_store(self, store):
+        """Move the inventory to a different on-disk layout and remove the old copy."""
+        self.ensure_loaded()
+        store.write(self.data)
+        old_store, self.store = self.store, store
+        old_store.delete()
+        self._changed_locations = set()
+        self._loaded_mtime = store.mtime()
+
+    def _publish_lookup(self):
+        """Regenerate the search-only lookup file from the barcode index, if one is configured."""
+        if self.lookup_publisher is not None:
+            self.lookup_publisher.publish(self.index)
+
+    def _rebuild_stats(self, index=None):
+        """Walk the whole structure once to seed the statistics after a load.
+
+        The streaming loader already builds the barcode index, so it can be passed in.
+        """
+        self.index = index if index is not None else build_barcode_index(self.data)
+        self.order_lines = {}
+        for barcode in self.index:
+            self._add_order_line(barcode)
+        self.location_counts = {}
+        self.shelf_counts = {}
+        self.total_items = 0
+        self.total_shelves = 0
+        self.total_nested_shelves = 0
+
+        for loc_name, shelves in self.data.get("locations", {}).items():
+            self.location_counts[loc_name] = 0
+            self.total_shelves += len(shelves)
+            for shelf_name, nested_shelves in shelves.items():
+                self.shelf_counts[(loc_name, shelf_name)] = 0
+                self.total_nested_shelves += len(nested_shelves)
+                for items in nested_shelves.values():
+                    self._count_items(loc_name, shelf_name, len(items))
+
+        self._duplicate_paths = {}
+        if self.total_items > len(self.index):
+            # Some barcodes are stored more than once; remember the copies the index does not point at
+            claimed = set()
+            for loc_name, shelves in self.data.get("locations", {}).items():
+                for shelf_name, nested_shelves in shelves.items():
+                    for nested_shelf_name, items in nested_shelves.items():
+                        path = (loc_name, shelf_name, nested_shelf_name)
+                        for barcode in items:
+                            if self.index[barcode] == path and barcode not in claimed:
+                                claimed.add(barcode)
+                            else:
+                                self._duplicate_paths.setdefault(barcode, []).append(path)
+
+    def _count_items(self, location_name, shelf_name, delta):
+        """Apply an item count change to a shelf, its location and the totals."""
+        self.shelf_counts[(location_name, shelf_name)] += delta
+        self.location_counts[location_name] += delta
+        self.total_items += delta
+
+    def _mark_changed(self, location_name):
+        """Remember that a location needs saving and belongs in the next incremental snapshot."""
+        self._changed_locations.add(location_name)
+        if self._snapshot_changes is not None:
+            self._snapshot_changes.add(location_name)
+
+    def _index_item(self, barcode, path, newest=False):
+        """Index one stored copy of a barcode; newest=True points the index at it if there are others."""
+        current = self.index.get(barcode)
+        if current is None:
+            self.index[barcode] = path
+            self._add_order_line(barcode)
+        elif newest:
+            self._duplicate_paths.setdefault(barcode, []).append(current)
+            self.index[barcode] = path
+        else:
+            self._duplicate_paths.setdefault(barcode, []).append(path)
+
+    def _unindex_items(self, items, path):
+        """Forget copies stored on the given nested shelf, re-pointing the index at any copy left elsewhere."""
+        for barcode in items:
+            others = self._duplicate_paths.get(barcode)
+            if self.index.get(barcode) == path:
+                if others:
+                    self.index[barcode] = others.pop()
+                else:
+                    del self.index[barcode]
+                    self._remove_order_line(barcode)
+            elif others and path in others:
+                others.remove(path)
+            if others is not None and not others:
+                del self._duplicate_paths[barcode]
+
+    def _add_order_line(self, barcode):
+        order_number, hyphen, line_number = barcode.partition("-")
+        if hyphen:
+            self.order_lines.setdefault(order_number, set()).add(line_number)
+
+    def _remove_order_line(self, barcode):
+        order_number, hyphen, line_number = barcode.partition("-")
+        lines = self.order_lines.get(order_number)
+        if hyphen and lines is not None:
+            lines.discard(line_number)
+            if not lines:
+                del self.order_lines[order_number]
+
+    # ----- Undo and redo -----
+
+    @contextmanager
+    def batch(self, description):
+        """Record every change made inside the block as a single undo step."""
+        if self._batch is not None:
+            yield
+            return
+        self._batch = []
+        try:
+            yield
+        finally:
+            entries, self._batch = self._batch, None
+            if entries:
+                self.history.push(HistoryEntry.combine(description, entries))
+
+    def undo(self):
+        """Revert the most recent change. Returns its description, or None if there is nothing to undo."""
+        entry = self.history.pop_undo()
+        if entry is None:
+            return None
+        for step, args in entry.undo_steps:
+            step(*args)
+        return entry.description
+
+    def redo(self):
+        """Re-apply the most recently undone change. Returns its description, or None if there is none."""
+        entry = self.history.pop_redo()
+        if entry is None:
+            return None
+        for step, args in entry.redo_steps:
+            step(*args)
+        return entry.description
+
+    def _record(self, description, undo_steps, redo_steps, cost=1):
+        entry = HistoryEntry(description, undo_steps, redo_steps, cost)
+        if self._batch is not None:
+            self._batch.append(entry)
+        else:
+            self.history.push(entry)
+
+    # ----- Structure changes -----
+
+    @property
+    def locations(self):
+        return self.data["locations"]
+
+    def add_location(self, location_name):
+        """Add an empty location. Returns False if it already exists."""
+        if location_name in self.locations:
+            return False
+        shelves = {}
+        self._insert_location(location_name, shelves)
+        self._record(f"add location '{location_name}'",
+                     [(self._detach_location, (location_name,))],
+                     [(self._insert_location, (location_name, shelves))])
+        return True
+
+    def remove_location(self, location_name):
+        """Remove a location and everything in it. Returns False if it does not exist."""
+        if location_name not in self.locations:
+            return False
+        cost = self.location_count(location_name) + 1
+        shelves, position = self._detach_location(location_name)
+        self._record(f"remove location '{location_name}'",
+                     [(self._insert_location, (location_name, shelves, position))],
+                     [(self._detach_location, (location_name,))], cost)
+        return True
+
+    def add_shelf(self, location_name, shelf_name):
+        """Add an empty shelf to a location. Returns False if it already exists."""
+        if shelf_name in self.locations[location_name]:
+            return False
+        nested_shelves = {}
+        self._insert_shelf(location_name, shelf_name, nested_shelves)
+        self._record(f"add shelf '{shelf_name}'",
+                     [(self._detach_shelf, (location_name, shelf_name))],
+                     [(self._insert_shelf, (location_name, shelf_name, nested_shelves))])
+        return True
+
+    def remove_shelf(self, location_name, shelf_name):
+        """Remove a shelf and its nested shelves. Returns False if it does not exist."""
+        if shelf_name not in self.locations[location_name]:
+            return False
+        cost = self.shelf_count(location_name, shelf_name) + 1
+        nested_shelves, position = self._detach_shelf(location_name, shelf_name)
+        self._record(f"remove shelf '{shelf_name}'",
+                     [(self._insert_shelf, (location_name, shelf_name, nested_shelves, position))],
+                     [(self._detach_shelf, (location_name, shelf_name))], cost)
+        return True
+
+    def add_nested_shelf(self, location_name, shelf_name, nested_shelf_name):
+        """Add an empty nested shelf to a shelf. Returns False if it already exists."""
+        if nested_shelf_name in self.locations[location_name][shelf_name]:
+            return False
+        items = []
+        self._insert_nested_shelf(location_name, shelf_name, nested_shelf_name, items)
+        self._record(f"add nested shelf '{nested_shelf_name}'",
+                     [(self._detach_nested_shelf, (location_name, shelf_name, nested_shelf_name))],
+                     [(self._insert_nested_shelf, (location_name, shelf_name, nested_shelf_name, items))])
+        return True
+
+    def remove_nested_shelf(self, location_name, shelf_name, nested_shelf_name):
+        """Remove a nested shelf and its items. Returns False if it does not exist."""
+        if nested_shelf_name not in self.locations[location_name][shelf_name]:
+            return False
+        items, position = self._detach_nested_shelf(location_name, shelf_name, nested_shelf_name)
+        self._record(f"remove nested shelf '{nested_shelf_name}'",
+                     [(self._insert_nested_shelf, (location_name, shelf_name, nested_shelf_name, items, position))],
+                     [(self._detach_nested_shelf, (location_name, shelf_name, nested_shelf_name))],
+                     len(items) + 1)
+        return True
+
+    # ----- Item changes -----
+
+    def clear_nested_shelf(self, location_name, shelf_name, nested_shelf_name):
+        """Remove all items from a nested shelf and return how many were removed."""
+        items = self.locations[location_name][shelf_name].get(nested_shelf_name, [])
+        removed = len(items)
+        if removed:
+            # The old list is swapped out rather than emptied, so undo can put it back as it was
+            empty_items = []
+            self._swap_items(location_name, shelf_name, nested_shelf_name, empty_items)
+            self._record(f"clear '{nested_shelf_name}'",
+                         [(self._swap_items, (location_name, shelf_name, nested_shelf_name, items))],
+                         [(self._swap_items, (location_name, shelf_name, nested_shelf_name, empty_items))],
+                         removed)
+        return removed
+
+    def add_item(self, location_name, shelf_name, nested_shelf_name, barcode):
+        """Add an item to a nested shelf, moving it if it is stored elsewhere.
+
+        Returns the (location, shelf, nested shelf) it was moved from, or None if it is new. An item
+        that is already on the target nested shelf is left alone (nothing is recorded or marked for
+        saving) and its current path is returned.
+        """
+        # Check the target first so a missing shelf cannot leave the item detached from its old one
+        if not self.has_nested_shelf(location_name, shelf_name, nested_shelf_name):
+            raise KeyError(f"Nested shelf '{nested_shelf_name}' in '{shelf_name}' ({location_name}) does not exist")
+        path = (location_name, shelf_name, nested_shelf_name)
+        previous_path = self.index.get(barcode)
+        if previous_path == path:
+            # The camera reports a visible label on every frame; re-scanning must not fill the history
+            return previous_path
+        undo_steps = [(self._detach_item, (path, barcode))]
+        redo_steps = []
+        if previous_path is not None:
+            position = self._detach_item(previous_path, barcode)
+            undo_steps.append((self._insert_item, (previous_path, barcode, position)))
+            redo_steps.append((self._detach_item, (previous_path, barcode)))
+
+        self._insert_item(path, barcode)
+        redo_steps.append((self._insert_item, (path, barcode)))
+        self._record(f"{'move' if previous_path else 'add'} '{barcode}'", undo_steps, redo_steps)
+        return previous_path
+
+    def add_items(self, location_name, shelf_name, nested_shelf_name, barcodes):
+        """Add several items to a nested shelf in one batch. Returns how many were moved from elsewhere."""
+        moved = 0
+        path = (location_name, shelf_name, nested_shelf_name)
+        with self.batch(f"add items to '{nested_shelf_name}'"):
+            for barcode in barcodes:
+                if self.add_item(location_name, shelf_name, nested_shelf_name, barcode) not in (None, path):
+                    moved += 1
+        return moved
+
+    # ----- Change primitives (used by the changes above and by undo/redo, never recorded) -----
+
+    def _insert_location(self, location_name, shelves, position=None):
+        _insert_at(self.locations, location_name, shelves, position)
+        self.location_counts[location_name] = 0
+        for shelf_name, nested_shelves in shelves.items():
+            self._account_shelf(location_name, shelf_name, nested_shelves, 1)
+        self._mark_changed(location_name)
+
+    def _detach_location(self, location_name):
+        """Take a location out of the inventory and return (its shelves, its position)."""
+        position = list(self.locations).index(location_name)
+        shelves = self.locations.pop(location_name)
+        for shelf_name, nested_shelves in shelves.items():
+            self._account_shelf(location_name, shelf_name, nested_shelves, -1)
+        del self.location_counts[location_name]
+        self._mark_changed(location_name)
+        return shelves, position
+
+    def _insert_shelf(self, location_name, shelf_name, nested_shelves, position=None):
+        _insert_at(self.locations[location_name], shelf_name, nested_shelves, position)
+        self._account_shelf(location_name, shelf_name, nested_shelves, 1)
+        self._mark_changed(location_name)
+
+    def _detach_shelf(self, location_name, shelf_name):
+        shelves = self.locations[location_name]
+        position = list(shelves).index(shelf_name)
+        nested_shelves = shelves.pop(shelf_name)
+        self._account_shelf(location_name, shelf_name, nested_shelves, -1)
+        self._mark_changed(location_name)
+        return nested_shelves, position
+
+    def _insert_nested_shelf(self, location_name, shelf_name, nested_shelf_name, items, position=None):
+        _insert_at(self.locations[location_name][shelf_name], nested_shelf_name, items, position)
+        self.total_nested_shelves += 1
+        self._account_items(location_name, shelf_name, nested_shelf_name, items, 1)
+        self._mark_changed(location_name)
+
+    def _detach_nested_shelf(self, location_name, shelf_name, nested_shelf_name):
+        nested_shelves = self.locations[location_name][shelf_name]
+        position = list(nested_shelves).index(nested_shelf_name)
+        items = nested_shelves.pop(nested_shelf_name)
+        self.total_nested_shelves -= 1
+        self._account_items(location_name, shelf_name, nested_shelf_name, items, -1)
+        self._mark_changed(location_name)
+        return items, position
+
+    def _swap_items(self, location_name, shelf_name, nested_shelf_name, items):
+        """Replace the item list of a nested shelf and return the old list untouched."""
+        nested_shelves = self.locations[location_name][shelf_name]
+        old_items = nested_shelves[nested_shelf_name]
+        self._account_items(location_name, shelf_name, nested_shelf_name, old_items, -1)
+        nested_shelves[nested_shelf_name] = items
+        self._account_items(location_name, shelf_name, nested_shelf_name, items, 1)
+        self._mark_changed(location_name)
+        return old_items
+
+    def _insert_item(self, path, barcode, position=None):
+        location_name, shelf_name, nested_shelf_name = path
+        items = self.locations[location_name][shelf_name][nested_shelf_name]
+        if position is None:
+            items.append(barcode)
+        else:
+            items.insert(position, barcode)
+        self._index_item(barcode, path, newest=True)
+        self._count_items(location_name, shelf_name, 1)
+        self._mark_changed(location_name)
+
+    def _detach_item(self, path, barcode):
+        """Remove one barcode from a nested shelf and return the position it had."""
+        location_name, shelf_name, nested_shelf_name = path
+        items = self.locations[location_name][shelf_name][nested_shelf_name]
+        position = items.index(barcode)
+        del items[position]
+        self._unindex_items((barcode,), path)
+        self._count_items(location_name, shelf_name, -1)
+        self._mark_changed(location_name)
+        return position
+
+    def _account_shelf(self, location_name, shelf_name, nested_shelves, sign):
+        """Add (sign=1) or subtract (sign=-1) a whole shelf to or from the statistics."""
+        if sign > 0:
+            self.shelf_counts[(location_name, shelf_name)] = 0
+        self.total_shelves += sign
+        self.total_nested_shelves += sign * len(nested_shelves)
+        for nested_shelf_name, items in nested_shelves.items():
+            self._account_items(location_name, shelf_name, nested_shelf_name, items, sign)
+        if sign < 0:
+            del self.shelf_counts[(location_name, shelf_name)]
+
+    def _account_items(self, location_name, shelf_name, nested_shelf_name, items, sign):
+        """Add or subtract a nested shelf's items to or from the index and the counts."""
+        path = (location_name, shelf_name, nested_shelf_name)
+        if sign > 0:
+            for barcode in items:
+                self._index_item(barcode, path)
+        else:
+            self._unindex_items(items, path)
+        self._count_items(location_name, shelf_name, sign * len(items))
+
+    # ----- Statistics -----
+
+    def has_nested_shelf(self, location_name, shelf_name, nested_shelf_name):
+        """Whether a nested shelf (and the shelf and location holding it) exists."""
+        return nested_shelf_name in self.locations.get(location_name, {}).get(shelf_name, {})
+
+    def nested_shelf_count(self, location_name, shelf_name, nested_shelf_name):
+        """Number of items in a nested shelf."""
+        return len(self.locations[location_name][shelf_name][nested_shelf_name])
+
+    def shelf_count(self, location_name, shelf_name):
+        """Number of items across all nested shelves of a shelf."""
+        return self.shelf_counts.get((location_name, shelf_name), 0)
+
+    def location_count(self, location_name):
+        """Number of items across all shelves of a location."""
+        return self.location_counts.get(location_name, 0)
+
+    def lines_for_order(self, order_number):
+        """Line numbers of an order that are already in the inventory, in natural order."""
+        return sorted(self.order_lines.get(order_number, ()), key=natural_sort_key)
+
+    def get_stats(self):
+        """Summary counts for dashboards."""
+        return {
+            "locations": len(self.locations),
+            "shelves": self.total_shelves,
+            "nested_shelves": self.total_nested_shelves,
+            "items": self.total_items,
+        }
+
+
+def _insert_at(mapping, key, value, position=None):
+    """Insert into a dict at a given position (at the end if None), keeping the dict object itself."""
+    if position is None or position >= len(mapping):
+        mapping[key] = value
+        return
+    entries = list(mapping.items())
+    entries.insert(position, (key, value))
+    mapping.clear()
+    mapping.update(entries)
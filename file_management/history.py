@@ -0,0 +1,75 @@
+class HistoryEntry:
+    """One undoable change: the steps that revert it, the steps that re-apply it and what it holds on to.
+
+    Steps are (function, args) pairs on the inventory model. They keep references to the containers a
+    change detached or replaced instead of copying them, so an entry costs memory proportional to the
+    change rather than to the inventory.
+    """
+
+    def __init__(self, description, undo_steps, redo_steps, cost=1):
+        self.description = description
+        self.undo_steps = undo_steps
+        self.redo_steps = redo_steps
+        self.cost = cost  # roughly the number of barcodes the entry keeps alive
+
+    @classmethod
+    def combine(cls, description, entries):
+        """Merge several entries into one step, undone in reverse order."""
+        undo_steps = [step for entry in reversed(entries) for step in entry.undo_steps]
+        redo_steps = [step for entry in entries for step in entry.redo_steps]
+        return cls(description, undo_steps, redo_steps, sum(entry.cost for entry in entries))
+
+
+class InventoryHistory:
+    """Undo and redo stacks whose depth is bounded by a memory budget instead of a step count.
+
+    When the entries on both stacks hold more than max_cost barcodes, the oldest undo steps are
+    dropped first, then the furthest redo steps.
+    """
+
+    def __init__(self, max_cost=500000):
+        self.max_cost = max_cost
+        self.undo_stack = []
+        self.redo_stack = []
+        self.total_cost = 0
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def push(self, entry):
+        """Record a new change; anything that could be redone is no longer reachable."""
+        self.total_cost -= sum(redo_entry.cost for redo_entry in self.redo_stack)
+        self.redo_stack = []
+        self.undo_stack.append(entry)
+        self.total_cost += entry.cost
+        self._trim()
+
+    def pop_undo(self):
+        """Move the newest change to the redo stack and return it (None if there is nothing to undo)."""
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        self.redo_stack.append(entry)
+        return entry
+
+    def pop_redo(self):
+        """Move the most recently undone change back to the undo stack and return it."""
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.undo_stack.append(entry)
+        return entry
+
+    def clear(self):
+        self.undo_stack = []
+        self.redo_stack = []
+        self.total_cost = 0
+
+    def _trim(self):
+        while self.total_cost > self.max_cost and self.undo_stack:
+            self.total_cost -= self.undo_stack.pop(0).cost
+        while self.total_cost > self.max_cost and self.redo_stack:
+            self.total_cost -= self.redo_stack.pop(0).cost
@@ -0,0 +1,303 @@
+import codecs
+import json
+import os
+from json.decoder import scanstring
+from json.scanner import NUMBER_RE
+
+
+class InventoryFormatError(Exception):
+    """Raised when the inventory file is not valid JSON and cannot be loaded."""
+
+    def __init__(self, message, path=""):
+        super().__init__(f"{path}: {message}" if path else message)
+        self.message = message
+        self.path = path
+
+
+class InventoryLoadResult:
+    """Data, barcode index and structure problems found while streaming an inventory file."""
+
+    def __init__(self, data, index, errors, mtime):
+        self.data = data
+        self.index = index  # barcode -> (location, shelf, nested shelf)
+        self.errors = errors  # list of "path: message" strings
+        self.mtime = mtime  # modification time of the file that was read
+
+    @property
+    def is_valid(self):
+        return not self.errors
+
+
+def format_path(*parts):
+    """Readable path like 'locations > Warehouse > Shelf 1 > Bin A [3]' for error messages."""
+    text = ""
+    for part in parts:
+        if isinstance(part, int):
+            text += f" [{part}]"
+        else:
+            text += f" > {part}" if text else str(part)
+    return text
+
+
+class _StreamReader:
+    """Character reader over a file that only keeps the unparsed part of the current chunk in memory."""
+
+    def __init__(self, file, total_bytes, progress_callback, chunk_size):
+        self.file = file
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.progress_callback = progress_callback
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.consumed = 0  # characters dropped from the front of the buffer
+        self.eof = False
+
+    def fill(self):
+        """Read the next chunk, discarding what has already been parsed. Returns False at end of file."""
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        try:
+            if not chunk:
+                self.eof = True
+                text = self.decoder.decode(b"", final=True)
+            else:
+                text = self.decoder.decode(chunk)
+        except UnicodeDecodeError as exc:
+            raise InventoryFormatError(f"Invalid UTF-8 at byte {self.bytes_read + exc.start}", "")
+        self.bytes_read += len(chunk)
+        self.consumed += self.pos
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        if self.progress_callback:
+            self.progress_callback(self.bytes_read, self.total_bytes)
+        return True
+
+    def error(self, message, path=""):
+        return InventoryFormatError(f"{message} at character {self.consumed + self.pos}", path)
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it ('' at end of file)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\n\r":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char, path):
+        if self.peek() != char:
+            found = self.peek() or "end of file"
+            raise self.error(f"Expected '{char}' but found '{found}'", path)
+        self.pos += 1
+
+    def read_string(self, path):
+        self.expect('"', path)
+        while True:
+            try:
+                value, end = scanstring(self.buf, self.pos)
+            except json.JSONDecodeError as exc:
+                # The string may continue in the next chunk
+                if self.fill():
+                    continue
+                message = exc.msg[:-len(" at")] if exc.msg.endswith(" at") else exc.msg
+                raise InventoryFormatError(f"{message} at character {self.consumed + exc.pos}", path)
+            self.pos = end
+            return value
+
+    def read_scalar(self, path):
+        """Read a number or true/false/null literal."""
+        # Make sure the whole token is in the buffer
+        while len(self.buf) - self.pos < 64 and self.fill():
+            pass
+        for literal, value in (("true", True), ("false", False), ("null", None)):
+            if self.buf.startswith(literal, self.pos):
+                self.pos += len(literal)
+                return value
+        match = NUMBER_RE.match(self.buf, self.pos)
+        if match is None:
+            raise self.error(f"Unexpected character '{self.peek() or 'end of file'}'", path)
+        integer, fraction, exponent = match.groups()
+        self.pos = match.end()
+        if fraction or exponent:
+            return float(integer + (fraction or "") + (exponent or ""))
+        return int(integer)
+
+    def read_value(self, path):
+        """Read any JSON value, used for parts of the file outside the inventory structure."""
+        char = self.peek()
+        if char == "{":
+            result = {}
+            for key in self.iter_object(path):
+                result[key] = self.read_value(format_path(path, key))
+            return result
+        if char == "[":
+            return [self.read_value(format_path(path, i)) for i in self.iter_array(path)]
+        if char == '"':
+            return self.read_string(path)
+        return self.read_scalar(path)
+
+    def iter_object(self, path):
+        """Yield each key of an object; the caller must read the value before advancing."""
+        self.expect("{", path)
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.read_string(path)
+            self.expect(":", format_path(path, key))
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("}", path)
+            return
+
+    def iter_array(self, path):
+        """Yield each index of an array; the caller must read the element before advancing."""
+        self.expect("[", path)
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]", path)
+            return
+
+
+_TYPE_NAMES = {dict: "object", list: "list", str: "string", bool: "boolean", type(None): "null"}
+
+
+def _type_name(value):
+    return _TYPE_NAMES.get(type(value), "number")
+
+
+class _InventoryParser:
+    """Validates the locations/shelves/nested shelves/items structure while building the model."""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.index = {}
+        self.errors = []
+
+    def parse(self):
+        reader = self.reader
+        data = {"locations": {}}
+        if reader.peek() != "{":
+            raise reader.error("Inventory file must contain a JSON object")
+
+        for key in reader.iter_object(""):
+            if key == "locations":
+                locations = self.read_mapping("locations", self.read_location)
+                if locations is not None:
+                    data["locations"] = locations
+            else:
+                data[key] = reader.read_value(key)
+
+        if reader.peek() != "":
+            raise reader.error("Unexpected data after the inventory object")
+        return data
+
+    def skip_wrong_type(self, path, expected):
+        value = self.reader.read_value(path)
+        self.errors.append(f"{path}: expected {expected}, found {_type_name(value)}")
+
+    def read_mapping(self, path, read_child):
+        """Read an object whose values are parsed with read_child, reporting and skipping bad values."""
+        reader = self.reader
+        if reader.peek() != "{":
+            self.skip_wrong_type(path, "an object")
+            return None
+        result = {}
+        for key in reader.iter_object(path):
+            child_path = format_path(path, key)
+            if key in result:
+                reader.read_value(child_path)
+                self.errors.append(f"{child_path}: duplicate name, the later entry was ignored")
+                continue
+            child = read_child(child_path, key)
+            if child is not None:
+                result[key] = child
+        return result
+
+    def read_location(self, path, location_name):
+        return self.read_mapping(
+            path, lambda shelf_path, shelf_name: self.read_shelf(shelf_path, location_name, shelf_name))
+
+    def read_shelf(self, path, location_name, shelf_name):
+        return self.read_mapping(
+            path, lambda nested_path, nested_name: self.read_items(nested_path,
+                                                                   (location_name, shelf_name, nested_name)))
+
+    def read_items(self, path, nested_shelf_path):
+        reader = self.reader
+        if reader.peek() != "[":
+            self.skip_wrong_type(path, "a list of barcodes")
+            return None
+        items = []
+        for i in reader.iter_array(path):
+            item_path = format_path(path, i)
+            if reader.peek() != '"':
+                self.skip_wrong_type(item_path, "a barcode string")
+                continue
+            barcode = reader.read_string(item_path)
+            if barcode in self.index:
+                first_path = self.index[barcode]
+                self.errors.append(f"{item_path}: duplicate barcode '{barcode}', "
+                                   f"already in {format_path('locations', *first_path)}")
+            else:
+                self.index[barcode] = nested_shelf_path
+            items.append(barcode)
+        return items
+
+
+def load_inventory_stream(json_file_path, progress_callback=None, chunk_size=1 << 16):
+    """Parse and validate an inventory file chunk by chunk, building the model as it goes.
+
+    progress_callback(bytes_read, total_bytes) is called after every chunk. Structure problems
+    are collected in the result; invalid JSON raises InventoryFormatError.
+    """
+    with open(json_file_path, 'rb') as file:
+        stat = os.fstat(file.fileno())
+        reader = _StreamReader(file, stat.st_size, progress_callback, chunk_size)
+        parser = _InventoryParser(reader)
+        data = parser.parse()
+    return InventoryLoadResult(data, parser.index, parser.errors, stat.st_mtime)
+
+
+def load_location_shards(shards, extra=None, mtime=None, progress_callback=None, chunk_size=1 << 16):
+    """Stream and validate per-location shard files into a single inventory model.
+
+    shards is a list of (location_name, file_path) pairs; each file holds that location's shelves.
+    Progress is reported over the combined size of all shards.
+    """
+    sizes = [os.path.getsize(file_path) for location_name, file_path in shards]
+    total_bytes = sum(sizes)
+    data = {"locations": {}}
+    data.update(extra or {})
+    parser = _InventoryParser(None)
+    done_bytes = 0
+
+    for (location_name, file_path), size in zip(shards, sizes):
+        def report_progress(bytes_read, shard_bytes, offset=done_bytes):
+            if progress_callback:
+                progress_callback(offset + bytes_read, total_bytes)
+
+        with open(file_path, 'rb') as file:
+            parser.reader = _StreamReader(file, size, report_progress, chunk_size)
+            location = parser.read_location(format_path("locations", location_name), location_name)
+            if parser.reader.peek() != "":
+                raise parser.reader.error("Unexpected data after the location object", file_path)
+        if location is not None:
+            data["locations"][location_name] = location
+        done_bytes += size
+
+    return InventoryLoadResult(data, parser.index, parser.errors, mtime)
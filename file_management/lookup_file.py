@@ -0,0 +1,287 @@
+import mmap
+import os
+import struct
+import threading
+import time
+
+from modules.utils import natural_sort_key
+
+# File layout (little endian):
+#   header   magic, entry count, path count, offset of the path table, offset of the string area
+#   entries  one (string offset, length, path number) per barcode, sorted by the barcode's UTF-8 bytes
+#   paths    one (offset, length) triple per distinct (location, shelf, nested shelf)
+#   strings  the UTF-8 bytes of every barcode and name; offsets above are relative to its start
+# A published lookup is a small pointer file (POINTER_MAGIC, then the UTF-8 name of the current data
+# file in the same directory) next to versioned data files. Windows refuses to replace or delete a
+# file another process has mapped, so each publish writes a new data file and only swaps the pointer.
+MAGIC = b"INVLKUP1"
+POINTER_MAGIC = b"INVLKPTR"
+HEADER = struct.Struct("<8sIIQQ")
+ENTRY = struct.Struct("<QHI")
+PATH = struct.Struct("<QIQIQI")
+# JSON allows lone surrogates in strings, which strict UTF-8 cannot encode
+ENCODING_ERRORS = "surrogatepass"
+
+
+def write_lookup_file(path, entries):
+    """Write (barcode, (location, shelf, nested shelf)) pairs as a lookup file, replacing it atomically.
+
+    Readers that still have the old file mapped keep seeing the old contents until they reopen it.
+    """
+    strings = bytearray()
+
+    def add_string(text):
+        encoded = text.encode("utf-8", ENCODING_ERRORS)
+        offset = len(strings)
+        strings.extend(encoded)
+        return offset, len(encoded)
+
+    path_numbers = {}
+    rows = []
+    for barcode, item_path in entries:
+        path_number = path_numbers.setdefault(item_path, len(path_numbers))
+        rows.append((barcode.encode("utf-8", ENCODING_ERRORS), path_number))
+    rows.sort()
+
+    entry_table = bytearray(ENTRY.size * len(rows))
+    for position, (barcode, path_number) in enumerate(rows):
+        offset = len(strings)
+        strings.extend(barcode)
+        ENTRY.pack_into(entry_table, position * ENTRY.size, offset, len(barcode), path_number)
+
+    path_table = bytearray(PATH.size * len(path_numbers))
+    for item_path, path_number in path_numbers.items():
+        fields = [field for name in item_path for field in add_string(name)]
+        PATH.pack_into(path_table, path_number * PATH.size, *fields)
+
+    paths_offset = HEADER.size + len(entry_table)
+    strings_offset = paths_offset + len(path_table)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(rows), len(path_numbers), paths_offset, strings_offset))
+        file.write(entry_table)
+        file.write(path_table)
+        file.write(strings)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def publish_lookup_file(path, entries):
+    """Write entries to a new versioned data file, point path at it and remove older versions.
+
+    A version that is still mapped elsewhere cannot be removed on Windows; it is left in place and
+    removed by a later publish.
+    """
+    directory, base_name = os.path.split(os.path.abspath(path))
+    data_name = f"{base_name}.{time.time_ns()}"
+    write_lookup_file(os.path.join(directory, data_name), entries)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(POINTER_MAGIC + data_name.encode("utf-8"))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+    prefix = base_name + "."
+    for name in os.listdir(directory):
+        if name != data_name and name.startswith(prefix) and name[len(prefix):].isdigit():
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+class LookupFile:
+    """Read-only, memory-mapped barcode lookup for search-only stations.
+
+    Opening maps the file without reading it, and a lookup is a binary search over the sorted entry
+    table that touches only a few pages, so startup does not grow with the inventory. The pages are
+    shared by every process that maps the same file. path may be a data file or a pointer file
+    written by publish_lookup_file; refresh() maps the current data file after the inventory has
+    been republished.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.error = None
+        self._mmap = None
+        self._stat = None
+        self._paths = {}  # path number -> decoded (location, shelf, nested shelf)
+        self._entry_count = 0
+        self._paths_offset = 0
+        self._strings_offset = 0
+
+    def refresh(self):
+        """Map the current file if it is new or has been replaced. Returns False if none is available."""
+        try:
+            data_path = self._data_path()
+            stat = os.stat(data_path)
+        except OSError as error:
+            self.error = f"Lookup file '{self.path}' is not available: {error.strerror}"
+            return self._mmap is not None
+        signature = (data_path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature == self._stat:
+            return True
+
+        try:
+            with open(data_path, 'rb') as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as error:
+            self.error = f"Lookup file '{data_path}' could not be opened: {error}"
+            return self._mmap is not None
+        if len(mapped) < HEADER.size or HEADER.unpack_from(mapped, 0)[0] != MAGIC:
+            mapped.close()
+            self.error = f"'{data_path}' is not an inventory lookup file."
+            return self._mmap is not None
+        magic, entry_count, path_count, paths_offset, strings_offset = HEADER.unpack_from(mapped, 0)
+
+        self.close()
+        self._mmap = mapped
+        self._stat = signature
+        self._entry_count = entry_count
+        self._paths_offset = paths_offset
+        self._strings_offset = strings_offset
+        self.error = None
+        return True
+
+    def _data_path(self):
+        """The data file path names, following a pointer file to the current version."""
+        with open(self.path, 'rb') as file:
+            head = file.read(len(POINTER_MAGIC) + 4096)
+        if not head.startswith(POINTER_MAGIC):
+            return self.path
+        data_name = head[len(POINTER_MAGIC):].decode("utf-8", "replace")
+        # The pointer may only name a file next to it
+        return os.path.join(os.path.dirname(self.path), os.path.basename(data_name))
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = None
+        self._stat = None
+        self._paths = {}
+
+    def __len__(self):
+        return self._entry_count
+
+    def get(self, barcode, default=None):
+        """(location, shelf, nested shelf) of a barcode, like dict.get on the inventory index."""
+        key = barcode.encode("utf-8", ENCODING_ERRORS)
+        position = self._bisect(key)
+        if position < self._entry_count and self._barcode(position) == key:
+            return self._path(position)
+        return default
+
+    def lines_for_order(self, order_number):
+        """Line numbers of an order, found as the run of barcodes starting with 'order-'."""
+        prefix = f"{order_number}-".encode("utf-8", ENCODING_ERRORS)
+        lines = []
+        position = self._bisect(prefix)
+        while position < self._entry_count:
+            barcode = self._barcode(position)
+            if not barcode.startswith(prefix):
+                break
+            lines.append(barcode[len(prefix):].decode("utf-8", ENCODING_ERRORS))
+            position += 1
+        return sorted(lines, key=natural_sort_key)
+
+    def _bisect(self, key):
+        """Position of the first entry whose barcode is not less than key."""
+        low, high = 0, self._entry_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._barcode(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _barcode(self, position):
+        offset, length, _ = ENTRY.unpack_from(self._mmap, HEADER.size + position * ENTRY.size)
+        start = self._strings_offset + offset
+        return self._mmap[start:start + length]
+
+    def _path(self, position):
+        path_number = ENTRY.unpack_from(self._mmap, HEADER.size + position * ENTRY.size)[2]
+        path = self._paths.get(path_number)
+        if path is None:
+            fields = PATH.unpack_from(self._mmap, self._paths_offset + path_number * PATH.size)
+            path = tuple(self._mmap[self._strings_offset + offset:self._strings_offset + offset + length].decode("utf-8", ENCODING_ERRORS)
+                         for offset, length in zip(fields[::2], fields[1::2]))
+            self._paths[path_number] = path
+        return path
+
+
+class LookupPublisher:
+    """Republishes the lookup file on a background thread once saves have been quiet for a while.
+
+    publish() only marks the index dirty, so a save costs the calling thread nothing; the writer
+    waits until quiet_period seconds have passed without another publish, then copies the index and
+    writes it, so a burst of saves produces one write. A failed write is kept in error and passed to
+    on_error(message) from the writer thread; later publishes still try again.
+    """
+
+    def __init__(self, path, on_error=None, quiet_period=1.0):
+        self.path = path
+        self.on_error = on_error
+        self.quiet_period = quiet_period
+        self.error = None
+        self._index = None  # index to write, or None if the file is up to date
+        self._due = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def publish(self, index):
+        with self._lock:
+            self._index = index
+            self._due = time.monotonic() + self.quiet_period
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_pending, daemon=True)
+                self._thread.start()
+
+    def flush(self, timeout=None):
+        """Write any pending index now and wait for the writer, e.g. before the app exits."""
+        with self._lock:
+            self._due = 0.0
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _write_pending(self):
+        try:
+            while True:
+                with self._lock:
+                    index = self._index
+                    if index is None:
+                        self._thread = None
+                        return
+                    delay = self._due - time.monotonic()
+                    if delay <= 0:
+                        self._index = None
+                if delay > 0:
+                    time.sleep(min(delay, 0.1))
+                    continue
+                try:
+                    publish_lookup_file(self.path, self._snapshot(index))
+                    self.error = None
+                except Exception as error:  # any failure must leave the publisher able to write again
+                    self.error = f"Lookup file could not be written: {error}"
+                    if self.on_error is not None:
+                        self.on_error(self.error)
+        finally:
+            # Even if on_error itself fails, the next publish must start a new writer
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+    @staticmethod
+    def _snapshot(index):
+        # The UI thread may be editing the index; copying it is a single C-level pass under the GIL,
+        # and a copy that still sees the dict change size is simply taken again
+        while True:
+            try:
+                return list(index.items())
+            except RuntimeError:
+                continue
@@ -0,0 +1,138 @@
+import copy
+import gzip
+import json
+import os
+from datetime import datetime
+
+SNAPSHOT_PREFIX = "snapshot-"
+SNAPSHOT_SUFFIX = ".json.gz"
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot cannot be read or its chain of increments is incomplete."""
+
+
+def copy_location(shelves):
+    """Copy one location's shelves; barcodes are strings, so only the containers need copying."""
+    return {shelf_name: {nested_shelf_name: list(items) for nested_shelf_name, items in nested_shelves.items()}
+            for shelf_name, nested_shelves in shelves.items()}
+
+
+class SnapshotManager:
+    """Timestamped, gzip-compressed, rotated inventory snapshots.
+
+    A full snapshot stores every location. An incremental snapshot stores only the locations changed
+    since the previous snapshot, plus the current location order, so unchanged locations are taken
+    from the snapshots before it. A new full snapshot starts a fresh chain every full_every snapshots,
+    and rotation always deletes whole chains so every remaining snapshot can be restored.
+    """
+
+    def __init__(self, directory, max_snapshots=30, full_every=10):
+        self.directory = directory
+        self.max_snapshots = max_snapshots
+        self.full_every = full_every
+        self.last_snapshot = None  # increments are only chained to snapshots written by this session
+        self.chain_length = 0
+
+    def list_snapshots(self):
+        """Snapshot file names, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith(SNAPSHOT_PREFIX) and name.endswith(SNAPSHOT_SUFFIX))
+
+    def describe(self, name):
+        """Human-readable label like '2026-10-19 14:03:12 (incremental)'."""
+        stamp, kind = name[len(SNAPSHOT_PREFIX):-len(SNAPSHOT_SUFFIX)].rsplit("-", 1)
+        created = datetime.strptime(stamp, "%Y%m%d-%H%M%S-%f")
+        return f"{created:%Y-%m-%d %H:%M:%S} ({kind})"
+
+    def prepare(self, inventory):
+        """Copy what the next snapshot needs out of the inventory.
+
+        Runs on the UI thread; for an incremental snapshot the cost is proportional to the changed
+        locations only. The returned payload can then be written with write() on a worker thread.
+        """
+        changed_locations = inventory.take_snapshot_changes()
+        full = changed_locations is None or self.last_snapshot is None or self.chain_length >= self.full_every
+        locations = inventory.locations
+        names = locations.keys() if full else changed_locations
+
+        return {
+            "kind": "full" if full else "incremental",
+            "base": None if full else self.last_snapshot,
+            "location_order": list(locations),
+            "locations": {name: copy_location(locations[name]) for name in names if name in locations},
+            "extra": {key: copy.deepcopy(value) for key, value in inventory.data.items() if key != "locations"},
+        }
+
+    def write(self, payload):
+        """Compress and write a prepared snapshot, then rotate old ones. Returns the new file name."""
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        name = f"{SNAPSHOT_PREFIX}{stamp}-{payload['kind']}{SNAPSHOT_SUFFIX}"
+        path = os.path.join(self.directory, name)
+
+        with gzip.open(path + ".tmp", 'wt', encoding='utf-8') as file:
+            json.dump(payload, file, separators=(',', ':'))
+        os.replace(path + ".tmp", path)
+
+        self.last_snapshot = name
+        self.chain_length = 0 if payload["kind"] == "full" else self.chain_length + 1
+        self.rotate()
+        return name
+
+    def rotate(self):
+        """Delete the oldest chains (a full snapshot and its increments) until under max_snapshots."""
+        names = self.list_snapshots()
+        chain_starts = [i for i, name in enumerate(names) if self._is_full(name)]
+        # Increments older than every full snapshot can no longer be restored
+        first_restorable = chain_starts[0] if chain_starts else len(names)
+        drop_until = first_restorable
+
+        for next_start in chain_starts[1:]:
+            if len(names) - drop_until <= self.max_snapshots:
+                break
+            drop_until = next_start
+
+        for name in names[:drop_until]:
+            os.remove(os.path.join(self.directory, name))
+
+    def load(self, name):
+        """Rebuild the inventory data as it was when the given snapshot was taken."""
+        names = self.list_snapshots()
+        if name not in names:
+            raise SnapshotError(f"Snapshot '{name}' does not exist.")
+        end = names.index(name)
+        start = end
+        while start >= 0 and not self._is_full(names[start]):
+            start -= 1
+        if start < 0:
+            raise SnapshotError(f"No full snapshot found before '{name}'.")
+
+        locations = {}
+        extra = {}
+        previous_name = None
+        for chain_name in names[start:end + 1]:
+            payload = self._read(chain_name)
+            if payload["kind"] == "incremental" and payload["base"] != previous_name:
+                raise SnapshotError(f"Snapshot '{chain_name}' is missing its base snapshot '{payload['base']}'.")
+            locations = {location_name: payload["locations"].get(location_name, locations.get(location_name, {}))
+                         for location_name in payload["location_order"]}
+            extra = payload["extra"]
+            previous_name = chain_name
+
+        data = {"locations": locations}
+        data.update(extra)
+        return data
+
+    def _read(self, name):
+        try:
+            with gzip.open(os.path.join(self.directory, name), 'rt', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError) as error:
+            raise SnapshotError(f"Snapshot '{name}' could not be read: {error}")
+
+    @staticmethod
+    def _is_full(name):
+        return name.endswith(f"-full{SNAPSHOT_SUFFIX}")
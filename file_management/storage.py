@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+
+from file_management.inventory_loader import InventoryFormatError, load_inventory_stream, load_location_shards
+
+MANIFEST_NAME = "manifest.json"
+JOURNAL_NAME = "journal.json"
+
+
+def _write_json(path, data, indent=4):
+    """Write JSON and flush it to disk so a later rename cannot expose a partial file."""
+    with open(path, 'w') as file:
+        json.dump(data, file, indent=indent)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+class JsonFileStore:
+    """The original layout: the whole inventory in one JSON file."""
+
+    layout_name = "single file"
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def backup_path(self):
+        root, ext = os.path.splitext(self.path)
+        return f"{root}_backup{ext}"
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def mtime(self):
+        """Change marker used to notice edits made outside the app."""
+        return os.path.getmtime(self.path) if self.exists() else None
+
+    def read(self, progress_callback=None):
+        return load_inventory_stream(self.path, progress_callback)
+
+    def write(self, data, changed_locations=None):
+        """Rewrite the whole file; a single file cannot be updated per location."""
+        temp_path = self.path + ".tmp"
+        _write_json(temp_path, data)
+        os.replace(temp_path, self.path)
+
+    def backup(self):
+        shutil.copyfile(self.path, self.backup_path)
+
+    def delete(self):
+        if self.exists():
+            os.remove(self.path)
+
+
+class ShardedStore:
+    """One JSON file per location plus a manifest, so an edit only rewrites the affected shards.
+
+    Directory layout:
+        manifest.json   {"version": 1, "locations": {name: shard file}, "extra": {other top-level keys}}
+        <slug>-<hash>.json   the shelves of one location
+        journal.json    present only while a commit is being applied
+    """
+
+    layout_name = "sharded"
+
+    def __init__(self, directory):
+        self.path = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self.journal_path = os.path.join(directory, JOURNAL_NAME)
+        self.manifest = None  # last manifest read or written
+
+    @property
+    def backup_path(self):
+        return self.path.rstrip("/\\") + "_backup"
+
+    def exists(self):
+        return os.path.exists(self.manifest_path) or os.path.exists(self.journal_path)
+
+    def mtime(self):
+        """Latest modification time over the manifest and every shard."""
+        if not os.path.exists(self.manifest_path):
+            return None
+        manifest = self.manifest or self._read_manifest()
+        times = [os.path.getmtime(self.manifest_path)]
+        for file_name in manifest["locations"].values():
+            shard_path = os.path.join(self.path, file_name)
+            if os.path.exists(shard_path):
+                times.append(os.path.getmtime(shard_path))
+        return max(times)
+
+    def read(self, progress_callback=None):
+        self.recover()
+        self.manifest = self._read_manifest()
+        shards = [(location_name, os.path.join(self.path, file_name))
+                  for location_name, file_name in self.manifest["locations"].items()]
+        return load_location_shards(shards, self.manifest.get("extra"), self.mtime(), progress_callback)
+
+    def write(self, data, changed_locations=None):
+        """Commit the changed locations' shards and the manifest atomically.
+
+        Every file is first written under a temporary name, then a journal listing the renames
+        is written, and only then are the files moved into place. If the app stops half way,
+        recover() finishes the commit from the journal, so a move between two locations is
+        never saved to only one of them. changed_locations=None rewrites every shard.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        if self.manifest is None:
+            self.manifest = self._read_manifest() if self.exists() else {"version": 1, "locations": {}, "extra": {}}
+        locations = data["locations"]
+        old_files = self.manifest["locations"]
+        if changed_locations is None:
+            changed_locations = set(locations) | set(old_files)
+
+        renames = []
+        deletes = []
+        for location_name in changed_locations:
+            if location_name in locations:
+                file_name = old_files.get(location_name) or self._shard_file_name(location_name)
+                _write_json(os.path.join(self.path, file_name + ".tmp"), locations[location_name])
+                renames.append(file_name)
+            elif location_name in old_files:
+                deletes.append(old_files[location_name])
+
+        manifest = {
+            "version": 1,
+            "locations": {name: old_files.get(name) or self._shard_file_name(name) for name in locations},
+            "extra": {key: value for key, value in data.items() if key != "locations"},
+        }
+        if manifest != self.manifest or list(manifest["locations"]) != list(old_files):
+            _write_json(os.path.join(self.path, MANIFEST_NAME + ".tmp"), manifest)
+            renames.append(MANIFEST_NAME)
+
+        if renames or deletes:
+            _write_json(self.journal_path, {"renames": renames, "deletes": deletes})
+            self.recover()
+        self.manifest = manifest
+
+    def recover(self):
+        """Finish a commit interrupted after its journal was written, and drop unfinished temp files."""
+        journal = None
+        if os.path.exists(self.journal_path):
+            try:
+                with open(self.journal_path, 'r') as file:
+                    journal = json.load(file)
+            except ValueError:
+                # Nothing is renamed before the journal is complete, so a torn journal
+                # belongs to a commit that never started
+                os.remove(self.journal_path)
+        if journal is not None:
+            for file_name in journal["renames"]:
+                temp_path = os.path.join(self.path, file_name + ".tmp")
+                if os.path.exists(temp_path):
+                    os.replace(temp_path, os.path.join(self.path, file_name))
+            for file_name in journal["deletes"]:
+                shard_path = os.path.join(self.path, file_name)
+                if os.path.exists(shard_path):
+                    os.remove(shard_path)
+            os.remove(self.journal_path)
+
+        # Temp files without a journal belong to a commit that never happened
+        if os.path.isdir(self.path):
+            for file_name in os.listdir(self.path):
+                if file_name.endswith(".tmp"):
+                    os.remove(os.path.join(self.path, file_name))
+
+    def backup(self):
+        self.recover()
+        if os.path.exists(self.backup_path):
+            shutil.rmtree(self.backup_path)
+        shutil.copytree(self.path, self.backup_path)
+
+    def delete(self):
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        self.manifest = None
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except ValueError as error:
+            raise InventoryFormatError(f"Manifest is not valid JSON: {error}", MANIFEST_NAME)
+
+    def _shard_file_name(self, location_name):
+        """Readable, filesystem-safe and collision-free file name for a location."""
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', location_name).strip('_')[:40] or "location"
+        digest = hashlib.sha1(location_name.encode('utf-8')).hexdigest()[:8]
+        return f"{slug}-{digest}.json"
+
+
+def open_store(json_file_path, sharded_directory):
+    """Use the sharded layout if it has been set up, otherwise the single JSON file."""
+    sharded_store = ShardedStore(sharded_directory)
+    if sharded_store.exists():
+        return sharded_store
+    return JsonFileStore(json_file_path)
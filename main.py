@@ -3,20 +3,45 @@ from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
-import json
+from kivy.uix.popup import Popup
+from kivy.uix.scrollview import ScrollView
+from kivy.uix.gridlayout import GridLayout
+from kivy.clock import Clock
+from itertools import islice
 import os
+import threading
 
+from file_management.file_manager import InventoryManager
+from file_management.inventory_loader import InventoryFormatError
+from file_management.storage import JsonFileStore, ShardedStore, open_store
+from file_management.snapshots import SnapshotManager, SnapshotError
+from file_management.lookup_file import LookupFile
 from shelf_manager.shelf_management import ShelfManagementScreen
 from search_manager.search_screen import SearchScreen
 
 
+JSON_FILE_PATH = "assets/inventory.json"
+SHARDED_DIRECTORY = "assets/inventory"
+SNAPSHOT_DIRECTORY = "assets/backups"
+LOOKUP_FILE_PATH = "assets/inventory.lookup"
+
+# Stations that only search set INVENTORY_SEARCH_ONLY=1 and read the lookup file published by the
+# stations that edit the inventory, so they never load or parse the inventory itself
+SEARCH_ONLY = os.environ.get("INVENTORY_SEARCH_ONLY") == "1"
+
+# A Label per row gets slow to lay out, so the validation report lists this many of each kind of row
+REPORT_ROWS = 100
+
+
 class MainScreen(Screen):
-    def __init__(self, **kwargs):
+    def __init__(self, inventory, **kwargs):
         super().__init__(**kwargs)
 
-        # Paths for JSON file and backup
-        self.json_file_path = "assets/inventory.json"
-        self.backup_file_path = "assets/inventory_backup.json"
+        # Shared inventory model and paths for JSON file and backup
+        self.inventory = inventory
+        self.json_file_path = inventory.json_file_path
+        self.snapshots = SnapshotManager(SNAPSHOT_DIRECTORY)
+        self.snapshot_running = False
 
         layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
 
@@ -26,7 +51,13 @@ class MainScreen(Screen):
 
         # JSON file handling options
         layout.add_widget(Button(text="Load/Create JSON File", on_press=self.load_json_file))
+        layout.add_widget(Button(text="View/Validate JSON File", on_press=self.validate_json_file))
         layout.add_widget(Button(text="Backup/Reset JSON File", on_press=self.backup_reset_json_file))
+        layout.add_widget(Button(text="Switch Storage Layout", on_press=self.switch_storage_layout))
+
+        # Snapshot backups that leave the live inventory untouched
+        layout.add_widget(Button(text="Create Backup Snapshot", on_press=self.create_snapshot))
+        layout.add_widget(Button(text="Restore Snapshot", on_press=self.restore_snapshot_popup))
 
         # Status indicator
         self.status_label = Label(text="Status: JSON file not loaded")
@@ -43,45 +74,257 @@ class MainScreen(Screen):
         self.status_label.text = "Search App opened."
 
     def load_json_file(self, instance):
-        if not os.path.exists(self.json_file_path):
+        if not self.inventory.store.exists():
             # Create a new JSON file with an empty structure
-            initial_data = {"locations": {}}
-            with open(self.json_file_path, 'w') as json_file:
-                json.dump(initial_data, json_file, indent=4)
+            self.inventory.load()
             self.status_label.text = "New JSON file created."
         else:
-            # Load existing JSON file
-            with open(self.json_file_path, 'r') as json_file:
-                data = json.load(json_file)
-            self.status_label.text = "JSON file loaded successfully."
+            # Stream the existing JSON file in the background and swap it in when done
+            self.read_json_in_background(self.on_json_loaded)
+
+    def validate_json_file(self, instance):
+        """Check the JSON file structure without replacing the loaded inventory."""
+        if not self.inventory.store.exists():
+            self.status_label.text = "No JSON file to validate."
+            return
+        self.read_json_in_background(self.show_validation_report)
+
+    def read_json_in_background(self, on_done):
+        """Parse and validate the JSON file on a worker thread, showing progress in the status label."""
+        last_percent = [-1]
+
+        def report_progress(bytes_read, total_bytes):
+            percent = 100 * bytes_read // total_bytes if total_bytes else 100
+            # Only hand a status update to the UI thread when the percentage changes
+            if percent != last_percent[0]:
+                last_percent[0] = percent
+                Clock.schedule_once(lambda dt: self.set_status(f"Reading JSON file... {percent}%"))
+
+        def worker():
+            try:
+                result = self.inventory.read_file(report_progress)
+            except (InventoryFormatError, OSError, ValueError) as error:
+                # The except variable is cleared when the block ends, so bind the text now
+                message = f"JSON file could not be read: {error}"
+                Clock.schedule_once(lambda dt: self.set_status(message))
+                return
+            Clock.schedule_once(lambda dt: on_done(result))
+
+        self.status_label.text = "Reading JSON file..."
+        threading.Thread(target=worker, daemon=True).start()
+
+    def set_status(self, text):
+        self.status_label.text = text
+
+    def on_json_loaded(self, result):
+        """Install a streamed load result as the shared inventory, unless the file was saved during the read."""
+        if self.inventory.store.mtime() != result.mtime:
+            # Edits saved while the worker was reading are newer than the result; keep them
+            self.status_label.text = "The JSON file changed while it was being read; load it again to see it."
+            return
+        self.inventory.apply_load_result(result)
+        stats = self.inventory.get_stats()
+        message = f"JSON file loaded successfully: {stats['locations']} locations, {stats['items']} items."
+        if result.errors:
+            message += f" {len(result.errors)} issues found, use View/Validate for details."
+        self.status_label.text = message
+
+    def show_validation_report(self, result):
+        """Popup summarising the JSON file and listing any structure problems with their paths."""
+        locations = result.data["locations"]
+        shelf_count = sum(len(shelves) for shelves in locations.values())
+        self.status_label.text = ("JSON file is valid." if result.is_valid
+                                  else f"JSON file has {len(result.errors)} issues.")
+
+        report = GridLayout(cols=1, spacing=5, size_hint_y=None)
+        report.bind(minimum_height=report.setter('height'))
+        report.add_widget(Label(text=f"{len(locations)} locations, {shelf_count} shelves, "
+                                     f"{len(result.index)} items", size_hint_y=None, height=36))
+        for location_name, shelves in islice(locations.items(), REPORT_ROWS):
+            shelf_names = ', '.join(islice(shelves, REPORT_ROWS)) or 'no shelves'
+            if len(shelves) > REPORT_ROWS:
+                shelf_names += f" and {len(shelves) - REPORT_ROWS} more"
+            report.add_widget(Label(text=f"{location_name}: {shelf_names}", size_hint_y=None, height=28))
+        if len(locations) > REPORT_ROWS:
+            report.add_widget(Label(text=f"... and {len(locations) - REPORT_ROWS} more locations",
+                                    size_hint_y=None, height=28))
+        if result.is_valid:
+            report.add_widget(Label(text="No problems found.", size_hint_y=None, height=36))
+        else:
+            report.add_widget(Label(text=f"Problems ({len(result.errors)}):", bold=True, size_hint_y=None, height=36))
+            for error in result.errors[:REPORT_ROWS]:
+                report.add_widget(Label(text=error, size_hint_y=None, height=28))
+            if len(result.errors) > REPORT_ROWS:
+                report.add_widget(Label(text=f"... and {len(result.errors) - REPORT_ROWS} more problems",
+                                        size_hint_y=None, height=28))
+
+        scroll_view = ScrollView()
+        scroll_view.add_widget(report)
+
+        popup_content = BoxLayout(orientation='vertical', spacing=10)
+        popup_content.add_widget(scroll_view)
+        close_button = Button(text="Close", size_hint=(1, 0.1))
+        popup_content.add_widget(close_button)
+
+        popup = Popup(title="Validate JSON File", content=popup_content, size_hint=(0.9, 0.9))
+        close_button.bind(on_press=popup.dismiss)
+        popup.open()
 
     def backup_reset_json_file(self, instance):
-        # Backup current JSON file
-        if os.path.exists(self.json_file_path):
-            with open(self.json_file_path, 'r') as original_file:
-                data = original_file.read()
-            with open(self.backup_file_path, 'w') as backup_file:
-                backup_file.write(data)
+        # Backup current JSON file (or shard directory)
+        if self.inventory.store.exists():
+            self.inventory.store.backup()
             self.status_label.text = "JSON file backed up successfully."
         else:
             self.status_label.text = "No JSON file to back up."
 
         # Reset the JSON file to initial structure
-        initial_data = {"locations": {}}
-        with open(self.json_file_path, 'w') as json_file:
-            json.dump(initial_data, json_file, indent=4)
+        self.inventory.reset()
         self.status_label.text = "JSON file reset to initial structure."
 
+    def create_snapshot(self, instance):
+        """Take a compressed snapshot in the background; only changed locations are copied when possible."""
+        if self.snapshot_running:
+            self.status_label.text = "A backup snapshot is already being written."
+            return
+        try:
+            self.inventory.ensure_loaded()
+        except InventoryFormatError as error:
+            self.status_label.text = f"JSON file could not be read: {error}"
+            return
+
+        payload = self.snapshots.prepare(self.inventory)
+        self.snapshot_running = True
+        self.status_label.text = f"Writing {payload['kind']} backup snapshot..."
+
+        def worker():
+            try:
+                name = self.snapshots.write(payload)
+            except (OSError, ValueError) as error:
+                message = str(error)  # the except variable does not outlive the block
+                Clock.schedule_once(lambda dt: self.on_snapshot_failed(message))
+                return
+            Clock.schedule_once(lambda dt: self.on_snapshot_written(name))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def on_snapshot_written(self, name):
+        self.snapshot_running = False
+        self.status_label.text = f"Backup snapshot saved: {self.snapshots.describe(name)}."
+
+    def on_snapshot_failed(self, error):
+        self.snapshot_running = False
+        # The changes taken for this snapshot were not saved, so the next one must be full
+        self.inventory.invalidate_snapshot_changes()
+        self.status_label.text = f"Backup snapshot failed: {error}"
+
+    def restore_snapshot_popup(self, instance):
+        """Popup listing the snapshots, newest first, each with a Restore button."""
+        names = self.snapshots.list_snapshots()
+        if not names:
+            self.status_label.text = "No backup snapshots available."
+            return
+
+        snapshot_list = GridLayout(cols=1, spacing=5, size_hint_y=None)
+        snapshot_list.bind(minimum_height=snapshot_list.setter('height'))
+
+        for name in reversed(names):
+            snapshot_box = BoxLayout(orientation='horizontal', size_hint_y=None, height=44)
+            snapshot_box.add_widget(Label(text=self.snapshots.describe(name), size_hint_x=0.7))
+            restore_button = Button(text="Restore", size_hint_x=0.3)
+            restore_button.bind(on_press=lambda btn, n=name: self.restore_snapshot(n, popup))
+            snapshot_box.add_widget(restore_button)
+            snapshot_list.add_widget(snapshot_box)
+
+        scroll_view = ScrollView()
+        scroll_view.add_widget(snapshot_list)
+
+        popup_content = BoxLayout(orientation='vertical', spacing=10)
+        popup_content.add_widget(scroll_view)
+        close_button = Button(text="Close", size_hint=(1, 0.1))
+        popup_content.add_widget(close_button)
+
+        popup = Popup(title="Restore Snapshot", content=popup_content, size_hint=(0.8, 0.8))
+        close_button.bind(on_press=popup.dismiss)
+        popup.open()
+
+    def restore_snapshot(self, name, popup):
+        """Rebuild the snapshot in the background, then swap it in as the live inventory."""
+        popup.dismiss()
+        self.status_label.text = f"Restoring snapshot {self.snapshots.describe(name)}..."
+
+        def worker():
+            try:
+                data = self.snapshots.load(name)
+            except SnapshotError as error:
+                message = f"Restore failed: {error}"
+                Clock.schedule_once(lambda dt: self.set_status(message))
+                return
+            Clock.schedule_once(lambda dt: self.on_snapshot_restored(name, data))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def on_snapshot_restored(self, name, data):
+        self.inventory.replace_data(data)
+        self.status_label.text = f"Inventory restored to snapshot {self.snapshots.describe(name)}."
+
+    def switch_storage_layout(self, instance):
+        """Convert between a single JSON file and one file per location."""
+        try:
+            if isinstance(self.inventory.store, ShardedStore):
+                self.inventory.switch_store(JsonFileStore(JSON_FILE_PATH))
+            else:
+                self.inventory.switch_store(ShardedStore(SHARDED_DIRECTORY))
+        except InventoryFormatError as error:
+            self.status_label.text = f"JSON file could not be read: {error}"
+            return
+        self.status_label.text = f"Inventory now stored as {self.inventory.store.layout_name} layout."
+
 
 class MainApp(App):
+    main_screen = None
+    shelf_screen = None
+
     def build(self):
+        if SEARCH_ONLY:
+            sm = ScreenManager()
+            sm.add_widget(SearchScreen(json_file_path=JSON_FILE_PATH, lookup=LookupFile(LOOKUP_FILE_PATH),
+                                       name='search'))
+            return sm
+
+        # One inventory model shared by all screens keeps the item counts in sync
+        inventory = InventoryManager(JSON_FILE_PATH, store=open_store(JSON_FILE_PATH, SHARDED_DIRECTORY),
+                                     lookup_path=LOOKUP_FILE_PATH)
+
         sm = ScreenManager()
-        sm.add_widget(MainScreen(name='main'))
-        sm.add_widget(ShelfManagementScreen(name='shelf_management', json_file_path="assets/inventory.json"))
-        sm.add_widget(SearchScreen(json_file_path="assets/inventory.json", name='search'))
+        self.main_screen = MainScreen(inventory=inventory, name='main')
+        sm.add_widget(self.main_screen)
+        self.shelf_screen = ShelfManagementScreen(name='shelf_management', json_file_path=JSON_FILE_PATH,
+                                                  inventory=inventory)
+        sm.add_widget(self.shelf_screen)
+        sm.add_widget(SearchScreen(json_file_path=JSON_FILE_PATH, inventory=inventory, name='search'))
+
+        # The lookup file is written on a background thread; report failures on the editing screens
+        inventory.lookup_publisher.on_error = lambda message: Clock.schedule_once(
+            lambda dt: self.report_lookup_error(message))
 
         return sm
 
+    def report_lookup_error(self, message):
+        """Search-only stations keep serving the last good lookup file, so make a failed write visible."""
+        text = f"{message} Search-only stations are showing older data."
+        self.main_screen.status_label.text = text
+        self.shelf_screen.status_label.text = text
+
+    def on_stop(self):
+        # Stop the shelf photo decoder's worker threads with the app
+        if self.shelf_screen is not None:
+            self.shelf_screen.tiled_decoder.shutdown()
+            # Write out a lookup file still waiting for its quiet period
+            publisher = self.shelf_screen.inventory.lookup_publisher
+            if publisher is not None:
+                publisher.flush(timeout=10)
+
 
 if __name__ == '__main__':
     MainApp().run()
@@ -10,9 +10,12 @@ class CameraScanner(Image):
         super().__init__(**kwargs)
         self.scan_callback = scan_callback
         self.capture = cv2.VideoCapture(0)  # Initialize camera (default camera index is 0)
+        self.camera_active = True
         Clock.schedule_interval(self.update, 1.0 / 30)  # 30 frames per second
 
     def update(self, dt):
+        if not self.camera_active:
+            return
         ret, frame = self.capture.read()
         if ret:
             # Convert to grayscale for better contrast
@@ -48,6 +51,25 @@ class CameraScanner(Image):
         """Resume the camera feed after pausing."""
         self.camera_active = True
 
+    def capture_still(self, width=3840, height=2160):
+        """Grab one frame at high resolution (the camera picks its closest supported size).
+
+        Returns the BGR frame, or None if the camera could not deliver one.
+        """
+        preview_width = self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)
+        preview_height = self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+        # Drop a few frames so exposure settles and the buffered low-resolution frames are flushed
+        for _ in range(3):
+            self.capture.grab()
+        ret, frame = self.capture.read()
+
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, preview_width)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, preview_height)
+        return frame if ret else None
+
     def release_camera(self):
         """Release the camera when done scanning."""
         if self.capture.isOpened():
@@ -0,0 +1,141 @@
+import time
+
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.label import Label
+from kivy.uix.popup import Popup
+from kivy.uix.scrollview import ScrollView
+from kivy.uix.textinput import TextInput
+
+
+class PendingScan:
+    """A hyphenless scan waiting for its line number."""
+
+    def __init__(self, order_number, description, target=None):
+        self.order_number = order_number
+        self.description = description  # e.g. where the item will go
+        self.target = target  # (location, shelf, nested shelf) the item will go to, if any
+
+
+class LineNumberQueue:
+    """Collects hyphenless scans so scanning never waits on a line number prompt.
+
+    A live camera reports a label on every frame it is visible, so a camera sighting of the same raw
+    barcode within repeat_window seconds of the last one is treated as the same label. Deliberate
+    scans (manual entry, wedge scanners, photos) are always queued: a hyphenless label only carries
+    the order number, so two items of one order scanned back to back look identical.
+    """
+
+    def __init__(self, repeat_window=2.0):
+        self.repeat_window = repeat_window
+        self.pending = []
+        self._last_seen = {}  # raw barcode -> time of last sighting
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, barcode_data, description="", target=None, sighting=False):
+        """Queue a hyphenless scan; sighting=True marks a live camera read.
+
+        Returns False if nothing was queued: an empty barcode, or a repeat sighting of the same label.
+        """
+        if not barcode_data:
+            return False
+        now = time.monotonic()
+        if len(self._last_seen) > 1000:
+            self._last_seen = {barcode: seen for barcode, seen in self._last_seen.items()
+                               if now - seen < self.repeat_window}
+        last_seen = self._last_seen.get(barcode_data)
+        self._last_seen[barcode_data] = now
+        if sighting and last_seen is not None and now - last_seen < self.repeat_window:
+            return False
+
+        # Assume order number is the first 10 digits
+        self.pending.append(PendingScan(barcode_data[:10], description, target))
+        return True
+
+    def suggest_lines(self, lines_for_order):
+        """Pre-fill line numbers from the lines already known for each order, one known line per scan."""
+        remaining = {}
+        suggestions = []
+        for scan in self.pending:
+            if scan.order_number not in remaining:
+                remaining[scan.order_number] = list(lines_for_order(scan.order_number))
+            known_lines = remaining[scan.order_number]
+            suggestions.append(known_lines.pop(0) if known_lines else "")
+        return suggestions
+
+    def open_assign_popup(self, lines_for_order, on_done=None, target_exists=None):
+        """Batch screen to enter the line numbers of all pending scans at once.
+
+        lines_for_order(order_number) returns the known line numbers for pre-filling. Scans left
+        blank stay in the queue. target_exists(location, shelf, nested_shelf) tells whether a scan's
+        target is still there; scans whose target was removed are flagged and dropped on submit.
+        on_done(assigned, dropped_scans) is called after submitting, where assigned is a list of
+        (scan, full "order-line" barcode) pairs, so the caller can apply them all in one batch.
+        """
+        if not self.pending:
+            return
+
+        def is_stale(scan):
+            return scan.target is not None and target_exists is not None and not target_exists(*scan.target)
+
+        scans = list(self.pending)
+        suggestions = self.suggest_lines(lines_for_order)
+
+        row_list = GridLayout(cols=1, spacing=5, size_hint_y=None)
+        row_list.bind(minimum_height=row_list.setter('height'))
+        line_inputs = []
+
+        for scan, suggestion in zip(scans, suggestions):
+            row = BoxLayout(orientation='horizontal', size_hint_y=None, height=44)
+            if is_stale(scan):
+                row.add_widget(Label(text=f"{scan.order_number} {scan.description} (shelf no longer exists)",
+                                     size_hint_x=0.5))
+                line_input = TextInput(hint_text="Will be dropped", multiline=False, size_hint_x=0.2,
+                                       disabled=True)
+            else:
+                row.add_widget(Label(text=f"{scan.order_number} {scan.description}", size_hint_x=0.5))
+                line_input = TextInput(text=suggestion, hint_text="Line number", multiline=False, size_hint_x=0.2)
+            known_lines = lines_for_order(scan.order_number)
+            row.add_widget(line_input)
+            row.add_widget(Label(text=f"Known: {', '.join(known_lines)}" if known_lines else "No known lines",
+                                 size_hint_x=0.3))
+            row_list.add_widget(row)
+            line_inputs.append(line_input)
+
+        scroll_view = ScrollView()
+        scroll_view.add_widget(row_list)
+
+        popup_content = BoxLayout(orientation='vertical', spacing=10)
+        popup_content.add_widget(scroll_view)
+        submit_button = Button(text="Assign Line Numbers", size_hint=(1, 0.1))
+        close_button = Button(text="Close", size_hint=(1, 0.1))
+        popup_content.add_widget(submit_button)
+        popup_content.add_widget(close_button)
+
+        popup = Popup(title=f"Line Numbers ({len(scans)} pending)", content=popup_content, size_hint=(0.9, 0.9))
+
+        def on_submit(instance):
+            assigned = []
+            dropped = []
+            for scan, line_input in zip(scans, line_inputs):
+                if scan not in self.pending:
+                    continue
+                # Checked again here, as the shelf may have been removed while the popup was open
+                if is_stale(scan):
+                    self.pending.remove(scan)
+                    dropped.append(scan)
+                    continue
+                line_number = line_input.text.strip()
+                if line_number:
+                    self.pending.remove(scan)
+                    assigned.append((scan, f"{scan.order_number}-{line_number}"))
+            popup.dismiss()
+            if on_done:
+                on_done(assigned, dropped)
+
+        submit_button.bind(on_press=on_submit)
+        close_button.bind(on_press=popup.dismiss)
+        popup.open()
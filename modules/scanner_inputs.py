@@ -0,0 +1,212 @@
+import queue
+import threading
+import time
+
+import cv2
+from pyzbar.pyzbar import decode
+from kivy.clock import Clock
+
+
+class ScanEvent:
+    """One barcode read by one scanner source."""
+
+    def __init__(self, source_id, barcode_data, timestamp):
+        self.source_id = source_id
+        self.barcode_data = barcode_data
+        self.timestamp = timestamp  # time.monotonic() when the barcode was read
+
+
+class CameraSource:
+    """A camera with its own capture thread and decode thread.
+
+    The capture thread always keeps only the newest frame, so a slow decode drops stale frames
+    instead of falling behind the camera. Reads are stamped with the time the frame was captured.
+    """
+
+    continuous = True  # reports a label on every frame it stays in view
+
+    def __init__(self, camera_index):
+        self.camera_index = camera_index
+        self.source_id = f"camera {camera_index}"
+        self.error = None
+        self._running = False
+        self._frame = None
+        self._decoding = None  # capture time of the frame being decoded
+        self._frame_ready = threading.Condition()
+        self._threads = []
+
+    def start(self, emit):
+        self._running = True
+        self._threads = [threading.Thread(target=self._capture_loop, daemon=True),
+                         threading.Thread(target=self._decode_loop, args=(emit,), daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._running = False
+        with self._frame_ready:
+            self._frame_ready.notify_all()
+
+    def pending_since(self):
+        """Capture time of the oldest frame that may still produce reads, or None if none is in flight."""
+        with self._frame_ready:
+            times = [stamp for stamp in (self._decoding, self._frame and self._frame[1]) if stamp is not None]
+        return min(times) if times else None
+
+    def _capture_loop(self):
+        capture = cv2.VideoCapture(self.camera_index)
+        if not capture.isOpened():
+            self.error = f"{self.source_id} could not be opened"
+            self._running = False
+        while self._running:
+            ret, frame = capture.read()
+            if not ret:
+                time.sleep(0.05)
+                continue
+            with self._frame_ready:
+                self._frame = (frame, time.monotonic())
+                self._frame_ready.notify()
+        capture.release()
+        with self._frame_ready:
+            self._frame_ready.notify_all()
+
+    def _decode_loop(self, emit):
+        while self._running:
+            with self._frame_ready:
+                while self._frame is None and self._running:
+                    self._frame_ready.wait()
+                if not self._running:
+                    return
+                frame, timestamp = self._frame
+                self._frame = None
+                self._decoding = timestamp
+            try:
+                gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                # Frames only arrive while the camera is open, so this never hides an open failure
+                error = None
+                for barcode in decode(gray_frame):
+                    try:
+                        barcode_data = barcode.data.decode("utf-8")
+                    except UnicodeDecodeError:
+                        error = f"{self.source_id}: skipped a label that is not UTF-8"
+                        continue
+                    emit(self.source_id, barcode_data, timestamp)
+                self.error = error
+            except Exception as error:  # one bad frame must not stop the camera for the session
+                self.error = f"{self.source_id}: frame could not be decoded ({error})"
+            finally:
+                # The reads are queued before the frame stops holding back the hub
+                with self._frame_ready:
+                    self._decoding = None
+
+
+class KeyboardWedgeSource:
+    """A USB HID wedge scanner, which types the barcode into a TextInput followed by Enter."""
+
+    continuous = False  # every read is a deliberate trigger pull
+
+    def __init__(self, text_input, source_id="keyboard"):
+        self.text_input = text_input
+        self.source_id = source_id
+        self.error = None
+        self._emit = None
+
+    def start(self, emit):
+        self._emit = emit
+        self.text_input.bind(on_text_validate=self._on_enter)
+
+    def stop(self):
+        self.text_input.unbind(on_text_validate=self._on_enter)
+
+    def pending_since(self):
+        # Reads are emitted on the main thread as soon as Enter is pressed
+        return None
+
+    def _on_enter(self, instance):
+        barcode_data = instance.text.strip()
+        instance.text = ""
+        # Keep focus so the next scan is typed into the same field
+        instance.focus = True
+        if barcode_data:
+            self._emit(self.source_id, barcode_data, time.monotonic())
+
+
+class ScanHub:
+    """Merges several scanner sources into one ordered, de-duplicated stream with a single consumer.
+
+    Sources push events from their own threads into a thread-safe queue. The hub drains it on the
+    Kivy main thread and only delivers an event once no source can still produce an older one:
+    each source's pending_since() gives the capture time of the oldest read it may still emit, so
+    a camera that is slow to decode holds back newer reads from the others instead of delivering
+    out of order. A continuous source (a camera) reports a label on every frame, so its repeat reads
+    of a barcode seen within repeat_window seconds are dropped; deliberate reads such as a wedge
+    trigger pull always get through. Each batch goes to consumer(events). Only the consumer touches the inventory, so
+    the sources never race on the data.
+    """
+
+    def __init__(self, consumer, repeat_window=2.0):
+        self.consumer = consumer
+        self.repeat_window = repeat_window
+        self.sources = []
+        self.counts = {}  # source id -> accepted scans
+        self._continuous = set()  # ids of sources whose repeat reads are dropped
+        self._events = queue.Queue()
+        self._pending = []
+        self._last_seen = {}
+        self._clock_event = None
+
+    def add_source(self, source):
+        self.sources.append(source)
+        self.counts[source.source_id] = 0
+        if source.continuous:
+            self._continuous.add(source.source_id)
+
+    def emit(self, source_id, barcode_data, timestamp):
+        """Called by sources from any thread."""
+        self._events.put(ScanEvent(source_id, barcode_data, timestamp))
+
+    def start(self):
+        for source in self.sources:
+            source.start(self.emit)
+        self._clock_event = Clock.schedule_interval(self.drain, 1.0 / 30)
+
+    def stop(self):
+        for source in self.sources:
+            source.stop()
+        if self._clock_event is not None:
+            self._clock_event.cancel()
+            self._clock_event = None
+
+    def drain(self, dt):
+        """Deliver every event that no source can still precede, in timestamp order, to the consumer."""
+        # Ask the sources before draining the queue, so any read they finish meanwhile is already queued
+        now = time.monotonic()
+        cutoff = min([now] + [stamp for stamp in (source.pending_since() for source in self.sources)
+                              if stamp is not None])
+        while True:
+            try:
+                self._pending.append(self._events.get_nowait())
+            except queue.Empty:
+                break
+        if not self._pending:
+            return
+
+        self._pending.sort(key=lambda event: event.timestamp)
+        ready = [event for event in self._pending if event.timestamp < cutoff]
+        self._pending = self._pending[len(ready):]
+
+        accepted = []
+        for event in ready:
+            last_seen = self._last_seen.get(event.barcode_data)
+            self._last_seen[event.barcode_data] = event.timestamp
+            if (event.source_id in self._continuous and last_seen is not None
+                    and event.timestamp - last_seen < self.repeat_window):
+                continue
+            self.counts[event.source_id] += 1
+            accepted.append(event)
+
+        if len(self._last_seen) > 1000:
+            self._last_seen = {barcode: seen for barcode, seen in self._last_seen.items()
+                               if now - seen < self.repeat_window}
+        if accepted:
+            self.consumer(accepted)
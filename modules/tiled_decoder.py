@@ -0,0 +1,77 @@
+import cv2
+from concurrent.futures import ThreadPoolExecutor
+from pyzbar.pyzbar import decode
+
+
+def tile_starts(length, tile_size, overlap):
+    """Start offsets of overlapping tiles along one axis; the last tile ends exactly at the edge."""
+    if length <= tile_size:
+        return [0]
+    step = tile_size - overlap
+    starts = list(range(0, length - tile_size, step))
+    starts.append(length - tile_size)
+    return starts
+
+
+def tile_bounds(width, height, tile_size, overlap):
+    """(x0, y0, x1, y1) of every tile, row by row from the top left."""
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in tile_starts(height, tile_size, overlap)
+            for x in tile_starts(width, tile_size, overlap)]
+
+
+def decode_tile(tile):
+    """Decode all barcodes in one grayscale tile (runs on a worker thread).
+
+    A misread label can carry bytes that are not UTF-8; it is skipped instead of failing the photo.
+    """
+    barcodes = []
+    for barcode in decode(tile):
+        try:
+            barcodes.append(barcode.data.decode("utf-8"))
+        except UnicodeDecodeError:
+            continue
+    return barcodes
+
+
+class TiledDecoder:
+    """Finds every barcode in a high-resolution still by decoding overlapping tiles in a thread pool.
+
+    pyzbar releases the GIL while zbar scans a tile, so threads decode tiles in parallel without
+    pickling them to other processes or re-importing the app there. The overlap must be at least the width of one label so that a label cut by one tile edge is
+    whole in the neighbouring tile. The whole image is decoded as well, to catch labels larger
+    than a tile.
+    """
+
+    def __init__(self, tile_size=800, overlap=200, max_workers=None):
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.max_workers = max_workers
+        self._executor = None
+
+    def decode(self, image):
+        """Return the unique barcodes in the image, in reading order (top to bottom, left to right)."""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        height, width = gray.shape[:2]
+        tiles = [gray[y0:y1, x0:x1] for x0, y0, x1, y1 in tile_bounds(width, height, self.tile_size, self.overlap)]
+        if len(tiles) > 1:
+            tiles.append(gray)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        # Labels in the overlap are decoded twice; keep the first sighting only
+        barcodes = []
+        seen = set()
+        for tile_barcodes in self._executor.map(decode_tile, tiles):
+            for barcode_data in tile_barcodes:
+                if barcode_data not in seen:
+                    seen.add(barcode_data)
+                    barcodes.append(barcode_data)
+        return barcodes
+
+    def shutdown(self):
+        """Stop the worker threads."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
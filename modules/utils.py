@@ -0,0 +1,58 @@
+import re
+
+
+def natural_sort_key(name):
+    """Split a name into text and number parts so 'Shelf 2' sorts before 'Shelf 10'."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+
+def build_barcode_index(data):
+    """Map every barcode to its (location, shelf, nested shelf) path in a single pass over the data."""
+    index = {}
+    for loc_name, shelves in data.get("locations", {}).items():
+        for shelf_name, nested_shelves in shelves.items():
+            for nested_shelf_name, items in nested_shelves.items():
+                path = (loc_name, shelf_name, nested_shelf_name)
+                for barcode in items:
+                    # Keep the first match, like a top-to-bottom search would
+                    index.setdefault(barcode, path)
+    return index
+
+
+def parse_pick_list(text):
+    """Extract barcodes from pasted or imported pick-list text (first column of each line)."""
+    barcodes = []
+    for line in text.splitlines():
+        fields = re.split(r'[,;\t]', line, maxsplit=1)
+        barcode = fields[0].strip()
+        if barcode:
+            barcodes.append(barcode)
+    return barcodes
+
+
+def plan_pick_route(barcodes, index):
+    """Resolve pick-list barcodes against the index and order the hits into a walking route.
+
+    Returns (route, not_found): route is a list of ((location, shelf, nested_shelf), [barcodes])
+    groups sorted by location, shelf and nested shelf; not_found keeps the pick-list order.
+    """
+    groups = {}
+    not_found = []
+    seen = set()
+
+    for barcode in barcodes:
+        # Duplicate order lines only need to be walked to once
+        if barcode in seen:
+            continue
+        seen.add(barcode)
+
+        path = index.get(barcode)
+        if path is None:
+            not_found.append(barcode)
+        else:
+            groups.setdefault(path, []).append(barcode)
+
+    route = sorted(groups.items(), key=lambda group: [natural_sort_key(name) for name in group[0]])
+    for path, items in route:
+        items.sort(key=natural_sort_key)
+    return route, not_found
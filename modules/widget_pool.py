@@ -0,0 +1,96 @@
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.label import Label
+from kivy.uix.popup import Popup
+from kivy.uix.scrollview import ScrollView
+
+
+class RowPool:
+    """Keeps detached row widgets around so they can be reused instead of rebuilt."""
+
+    def __init__(self, create_row):
+        self.create_row = create_row
+        self._free_rows = []
+
+    def acquire(self):
+        """Return a free row, creating one only when the pool is empty."""
+        if self._free_rows:
+            return self._free_rows.pop()
+        return self.create_row()
+
+    def release(self, row):
+        """Detach a row from its parent and keep it for later."""
+        if row.parent:
+            row.parent.remove_widget(row)
+        self._free_rows.append(row)
+
+
+class ListPopup:
+    """A popup listing one row per key that is refreshed in place instead of being rebuilt.
+
+    Only rows whose key appeared or disappeared are added or removed; rows come from a RowPool and
+    update_row(row, context, key) fills in the text and the target of the row's buttons. The popup
+    itself is kept and reused, so refreshing never stacks a new popup on top of the old one.
+    """
+
+    def __init__(self, row_pool, update_row, footer_buttons):
+        self.row_pool = row_pool
+        self.update_row = update_row
+        self.rows = {}  # key -> row widget currently shown
+        self.context = None  # what the popup is showing, passed to update_row and the footer callbacks
+        self.is_open = False
+
+        self.row_list = GridLayout(cols=1, spacing=5, size_hint_y=None)
+        self.row_list.bind(minimum_height=self.row_list.setter('height'))
+        scroll_view = ScrollView()
+        scroll_view.add_widget(self.row_list)
+
+        self.empty_label = Label(size_hint_y=None, height=0)
+
+        popup_content = BoxLayout(orientation='vertical', spacing=10)
+        popup_content.add_widget(self.empty_label)
+        popup_content.add_widget(scroll_view)
+
+        # Footer buttons act on whatever the popup is currently showing
+        for text, callback in footer_buttons:
+            button = Button(text=text, size_hint=(1, 0.15))
+            button.bind(on_press=lambda btn, cb=callback: cb(self.context))
+            popup_content.add_widget(button)
+
+        close_button = Button(text="Close", size_hint=(1, 0.15))
+        popup_content.add_widget(close_button)
+
+        self.popup = Popup(content=popup_content, size_hint=(0.8, 0.8))
+        close_button.bind(on_press=self.popup.dismiss)
+        self.popup.bind(on_open=lambda x: setattr(self, 'is_open', True),
+                        on_dismiss=lambda x: setattr(self, 'is_open', False))
+
+    def show(self, title, context, keys, empty_text):
+        """Point the popup at a new context, sync its rows and open it if it is not already open."""
+        self.popup.title = title
+        self.context = context
+        self.empty_text = empty_text
+        self.refresh(keys)
+        if not self.is_open:
+            self.popup.open()
+
+    def refresh(self, keys):
+        """Sync the rows with keys: release rows for removed keys, insert rows for new ones, relabel the rest."""
+        keys = list(keys)
+        wanted = set(keys)
+
+        for key in [key for key in self.rows if key not in wanted]:
+            self.row_pool.release(self.rows.pop(key))
+
+        for position, key in enumerate(keys):
+            row = self.rows.get(key)
+            if row is None:
+                row = self.row_pool.acquire()
+                self.rows[key] = row
+                # Kivy counts child indexes from the bottom, so convert the top-down position
+                self.row_list.add_widget(row, index=len(self.row_list.children) - position)
+            self.update_row(row, self.context, key)
+
+        self.empty_label.text = "" if keys else self.empty_text
+        self.empty_label.height = 0 if keys else 44
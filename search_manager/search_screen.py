@@ -5,14 +5,24 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.textinput import TextInput
 from kivy.uix.label import Label
-import json
+from kivy.uix.scrollview import ScrollView
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.filechooser import FileChooserListView
+import time
 
 from modules.camera_scanner import CameraScanner  # Import your CameraScanner class
+from modules.utils import parse_pick_list, plan_pick_route
+from modules.line_queue import LineNumberQueue
+from file_management.file_manager import InventoryManager
+from file_management.inventory_loader import InventoryFormatError
 
 class SearchScreen(Screen):
-    def __init__(self, json_file_path, **kwargs):
+    def __init__(self, json_file_path, inventory=None, lookup=None, **kwargs):
         super().__init__(**kwargs)
         self.json_file_path = json_file_path
+        self.inventory = inventory or InventoryManager(json_file_path)
+        # Search-only stations answer lookups from the memory-mapped lookup file instead of the inventory
+        self.lookup = lookup
 
         # Layout for search screen
         layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
@@ -31,14 +41,26 @@ class SearchScreen(Screen):
         scan_button.bind(on_press=self.open_camera_popup)
         layout.add_widget(scan_button)
 
+        # Batch Lookup Button for pick lists
+        batch_button = Button(text="Batch Lookup (Pick List)")
+        batch_button.bind(on_press=self.open_batch_lookup_popup)
+        layout.add_widget(batch_button)
+
+        # Hyphenless barcodes waiting for a line number
+        self.line_queue = LineNumberQueue()
+        self.assign_lines_button = Button(text="Assign Line Numbers (0)")
+        self.assign_lines_button.bind(on_press=self.assign_line_numbers)
+        layout.add_widget(self.assign_lines_button)
+
         # Results display
         self.result_label = Label(text="Search results will appear here.")
         layout.add_widget(self.result_label)
 
-        # Close button to return to MainScreen
-        close_button = Button(text="Close", size_hint=(1, 0.1))
-        close_button.bind(on_press=self.return_to_main)
-        layout.add_widget(close_button)
+        # Close button to return to MainScreen (a search-only station has no main screen)
+        if lookup is None:
+            close_button = Button(text="Close", size_hint=(1, 0.1))
+            close_button.bind(on_press=self.return_to_main)
+            layout.add_widget(close_button)
 
         self.add_widget(layout)
 
@@ -47,38 +69,51 @@ class SearchScreen(Screen):
         self.manager.current = 'main'  # Assuming the main screen is named 'main'
 
     def load_json_data(self):
-        """Utility function to load JSON data."""
-        with open(self.json_file_path, 'r') as file:
-            return json.load(file)
+        """Utility function to get the inventory data, loading it on first use."""
+        return self.inventory.ensure_loaded()
+
+    def load_barcode_index(self):
+        """Return the inventory's barcode index, or None (with a message) if the file cannot be read."""
+        if self.lookup is not None:
+            # Only re-maps the file if the inventory was republished since the last search
+            if not self.lookup.refresh():
+                self.result_label.text = self.lookup.error
+                return None
+            return self.lookup
+        try:
+            self.load_json_data()
+        except InventoryFormatError as error:
+            self.result_label.text = f"JSON file could not be read: {error}"
+            return None
+        return self.inventory.index
 
     def search_item(self, instance):
         """Initiate barcode processing for manual search."""
         barcode = self.barcode_input.text.strip()
-        self.process_barcode(barcode, self.perform_search)
         self.barcode_input.text = ""
+        if not barcode:
+            self.result_label.text = "Enter a barcode to search for."
+            return
+        self.process_barcode(barcode, self.perform_search)
 
     def perform_search(self, barcode):
         """Perform the search and display results after barcode is fully processed."""
-        data = self.load_json_data()
+        index = self.load_barcode_index()
+        if index is None:
+            return
         found = False
         location_info = ""
 
-        # Loop through the JSON structure to search for the item
-        for loc_name, shelves in data.get("locations", {}).items():
-            for shelf_name, nested_shelves in shelves.items():
-                for nested_shelf_name, items in nested_shelves.items():
-                    if barcode in items:
-                        # Play the 'found' sound when item is located
-                        found_beep = SoundLoader.load('./assets/found_beep.mp3')
-                        if found_beep:
-                            found_beep.play()
-                        location_info = f"Found in {loc_name} > {shelf_name} > {nested_shelf_name}"
-                        found = True
-                        break
-                if found:
-                    break
-            if found:
-                break
+        # The inventory keeps a barcode index, so no need to walk the whole structure
+        path = index.get(barcode)
+        if path is not None:
+            loc_name, shelf_name, nested_shelf_name = path
+            # Play the 'found' sound when item is located
+            found_beep = SoundLoader.load('./assets/found_beep.mp3')
+            if found_beep:
+                found_beep.play()
+            location_info = f"Found in {loc_name} > {shelf_name} > {nested_shelf_name}"
+            found = True
 
         # Play 'not found' sound only if item was not located
         if not found:
@@ -92,7 +127,7 @@ class SearchScreen(Screen):
     def open_camera_popup(self, instance):
         """Open a popup with the camera to scan a barcode."""
         def handle_barcode_data(barcode_data):
-            self.process_barcode(barcode_data, self.perform_search)
+            self.process_barcode(barcode_data, self.perform_search, sighting=True)
             scanner_popup.dismiss()  # Close the popup after scanning
 
         # Create CameraScanner instance
@@ -110,30 +145,197 @@ class SearchScreen(Screen):
         scanner_popup.bind(on_dismiss=lambda x: scanner_widget.release_camera())  # Ensure camera is released
         scanner_popup.open()
 
-    def process_barcode(self, barcode_data, callback):
-        """Process barcode data to ensure consistent format and call callback when ready."""
+    def process_barcode(self, barcode_data, callback, sighting=False):
+        """Process barcode data to ensure consistent format and call callback when ready.
+
+        sighting=True marks a live camera read, whose repeats of the same label are ignored.
+        """
         if "-" in barcode_data:
             callback(barcode_data)  # Barcode already in the correct format
-        else:
-            # Barcode without hyphen: assume order number is the first 10 digits
-            order_number = barcode_data[:10]
-            self.prompt_line_number(order_number, callback)
+        elif self.line_queue.add(barcode_data, sighting=sighting):
+            # Barcode without hyphen: queue it; the operator assigns line numbers in one batch later
+            self.assign_lines_button.text = f"Assign Line Numbers ({len(self.line_queue)})"
+            self.result_label.text = (f"Order '{barcode_data[:10]}' queued for a line number "
+                                      f"({len(self.line_queue)} pending).")
+        elif barcode_data:
+            self.result_label.text = f"Order '{barcode_data[:10]}' is still in view, repeat sighting ignored."
+
+    def assign_line_numbers(self, instance):
+        """Open the batch screen for queued hyphenless barcodes, pre-filled from known order lines."""
+        if not self.line_queue:
+            self.result_label.text = "No barcodes are waiting for a line number."
+            return
+        if self.load_barcode_index() is None:
+            return
+        self.line_queue.open_assign_popup(self.lines_for_order, self.on_line_numbers_assigned)
+
+    def lines_for_order(self, order_number):
+        """Known line numbers of an order, from the lookup file on search-only stations."""
+        if self.lookup is not None:
+            return self.lookup.lines_for_order(order_number)
+        return self.inventory.lines_for_order(order_number)
+
+    def on_line_numbers_assigned(self, assigned, dropped):
+        """Search a single completed barcode, or show several as a pick route."""
+        barcodes = [barcode for scan, barcode in assigned]
+        self.assign_lines_button.text = f"Assign Line Numbers ({len(self.line_queue)})"
+        if len(barcodes) == 1:
+            self.perform_search(barcodes[0])
+        elif barcodes:
+            self.resolve_pick_list("\n".join(barcodes))
+
+    def open_batch_lookup_popup(self, instance):
+        """Popup to paste, import or scan a pick list and resolve it in one pass."""
+        popup_content = BoxLayout(orientation='vertical', spacing=10)
+
+        # One barcode per line; extra columns (e.g. quantities) are ignored
+        pick_list_input = TextInput(hint_text="Paste pick list (one barcode per line)")
+        popup_content.add_widget(pick_list_input)
+
+        button_row = BoxLayout(orientation='horizontal', size_hint=(1, 0.15), spacing=10)
+        import_button = Button(text="Import List")
+        import_button.bind(on_press=lambda x: self.import_pick_list_popup(pick_list_input))
+        scan_button = Button(text="Scan Items")
+        scan_button.bind(on_press=lambda x: self.scan_pick_list_popup(pick_list_input))
+        resolve_button = Button(text="Resolve")
+        resolve_button.bind(on_press=lambda x: self.resolve_pick_list(pick_list_input.text))
+        close_button = Button(text="Close")
+
+        button_row.add_widget(import_button)
+        button_row.add_widget(scan_button)
+        button_row.add_widget(resolve_button)
+        button_row.add_widget(close_button)
+        popup_content.add_widget(button_row)
+
+        popup = Popup(title="Batch Lookup", content=popup_content, size_hint=(0.9, 0.9))
+        close_button.bind(on_press=popup.dismiss)
+        popup.open()
+
+    def import_pick_list_popup(self, pick_list_input):
+        """Popup to choose a text or CSV file and append its lines to the pick list."""
+        popup_content = BoxLayout(orientation='vertical', spacing=10)
+        file_chooser = FileChooserListView(filters=["*.txt", "*.csv"])
+        popup_content.add_widget(file_chooser)
+
+        button_row = BoxLayout(orientation='horizontal', size_hint=(1, 0.15), spacing=10)
+        load_button = Button(text="Load")
+        close_button = Button(text="Close")
+        button_row.add_widget(load_button)
+        button_row.add_widget(close_button)
+        popup_content.add_widget(button_row)
+
+        popup = Popup(title="Import Pick List", content=popup_content, size_hint=(0.9, 0.9))
+
+        def on_load(instance):
+            if file_chooser.selection:
+                with open(file_chooser.selection[0], 'r') as file:
+                    self.append_pick_lines(pick_list_input, parse_pick_list(file.read()))
+            popup.dismiss()
+
+        load_button.bind(on_press=on_load)
+        close_button.bind(on_press=popup.dismiss)
+        popup.open()
 
-    def prompt_line_number(self, order_number, callback):
-        """Prompt the user to enter a line number if barcode lacks hyphen, return formatted barcode."""
-        line_popup_content = BoxLayout(orientation='vertical')
-        line_input = TextInput(hint_text="Enter line number", multiline=False)
-        submit_button = Button(text="Submit")
+    def scan_pick_list_popup(self, pick_list_input):
+        """Keep the camera open and append every scanned barcode to the pick list."""
+        # Hyphenless labels wait here for their line numbers, then join the pick list
+        pick_queue = LineNumberQueue()
+        # The camera reports a label on every frame it is in view; each barcode joins the list once
+        seen = set(parse_pick_list(pick_list_input.text))
 
-        line_popup_content.add_widget(line_input)
-        line_popup_content.add_widget(submit_button)
+        def handle_barcode_data(barcode_data):
+            if "-" not in barcode_data:
+                if pick_queue.add(barcode_data, sighting=True):
+                    assign_button.text = f"Assign Line Numbers ({len(pick_queue)})"
+                return
+            if barcode_data not in seen:
+                seen.add(barcode_data)
+                self.append_pick_lines(pick_list_input, [barcode_data])
+
+        def assign_line_numbers(instance):
+            if pick_queue and self.load_barcode_index() is not None:
+                pick_queue.open_assign_popup(self.lines_for_order, on_line_numbers_assigned)
+
+        def on_line_numbers_assigned(assigned, dropped):
+            barcodes = [barcode for scan, barcode in assigned if barcode not in seen]
+            seen.update(barcodes)
+            self.append_pick_lines(pick_list_input, barcodes)
+            assign_button.text = f"Assign Line Numbers ({len(pick_queue)})"
+
+        def on_dismiss(instance):
+            scanner_widget.release_camera()
+            if pick_queue:
+                self.result_label.text = f"{len(pick_queue)} scans without a line number were left out of the pick list."
+
+        scanner_widget = CameraScanner(scan_callback=handle_barcode_data)
+
+        popup_content = BoxLayout(orientation='vertical')
+        popup_content.add_widget(scanner_widget)
+        assign_button = Button(text="Assign Line Numbers (0)", size_hint=(1, 0.1))
+        assign_button.bind(on_press=assign_line_numbers)
+        popup_content.add_widget(assign_button)
+        done_button = Button(text="Done", size_hint=(1, 0.1))
+        done_button.bind(on_press=lambda x: scanner_popup.dismiss())
+        popup_content.add_widget(done_button)
+
+        scanner_popup = Popup(title="Scan Pick List", content=popup_content, size_hint=(0.9, 0.9))
+        scanner_popup.bind(on_dismiss=on_dismiss)
+        scanner_popup.open()
+
+    def append_pick_lines(self, pick_list_input, barcodes):
+        """Append barcodes to the pick list input, one per line."""
+        if not barcodes:
+            return
+        text = pick_list_input.text
+        if text and not text.endswith("\n"):
+            text += "\n"
+        pick_list_input.text = text + "\n".join(barcodes) + "\n"
+
+    def resolve_pick_list(self, pick_list_text):
+        """Resolve the whole pick list against the barcode index and show the walking route."""
+        barcodes = parse_pick_list(pick_list_text)
+        if not barcodes:
+            self.result_label.text = "Pick list is empty."
+            return
+
+        start = time.perf_counter()
+        index = self.load_barcode_index()
+        if index is None:
+            return
+        route, not_found = plan_pick_route(barcodes, index)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        found_count = sum(len(items) for path, items in route)
+        duplicate_count = len(barcodes) - found_count - len(not_found)
+        self.result_label.text = (f"Resolved {len(barcodes)} lines in {elapsed_ms:.1f} ms: "
+                                  f"{found_count} found, {len(not_found)} not found")
+        self.result_label.text += f", {duplicate_count} duplicates skipped." if duplicate_count else "."
+        self.show_pick_route_popup(route, not_found)
 
-        line_popup = Popup(title="Enter Line Number", content=line_popup_content, size_hint=(0.6, 0.4))
+    def show_pick_route_popup(self, route, not_found):
+        """Display the resolved pick list grouped by location in walking order."""
+        results = GridLayout(cols=1, spacing=5, size_hint_y=None)
+        results.bind(minimum_height=results.setter('height'))
 
-        def on_submit(instance):
-            line_number = line_input.text
-            callback(f"{order_number}-{line_number}")
-            line_popup.dismiss()
+        for (loc_name, shelf_name, nested_shelf_name), items in route:
+            results.add_widget(Label(text=f"{loc_name} > {shelf_name} > {nested_shelf_name}",
+                                     bold=True, size_hint_y=None, height=36))
+            for barcode in items:
+                results.add_widget(Label(text=barcode, size_hint_y=None, height=28))
+
+        if not_found:
+            results.add_widget(Label(text=f"Not found ({len(not_found)})", bold=True, size_hint_y=None, height=36))
+            for barcode in not_found:
+                results.add_widget(Label(text=barcode, size_hint_y=None, height=28))
+
+        scroll_view = ScrollView()
+        scroll_view.add_widget(results)
+
+        popup_content = BoxLayout(orientation='vertical', spacing=10)
+        popup_content.add_widget(scroll_view)
+        close_button = Button(text="Close", size_hint=(1, 0.1))
+        popup_content.add_widget(close_button)
 
-        submit_button.bind(on_press=on_submit)
-        line_popup.open()
+        popup = Popup(title="Pick Route", content=popup_content, size_hint=(0.9, 0.9))
+        close_button.bind(on_press=popup.dismiss)
+        popup.open()
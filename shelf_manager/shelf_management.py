@@ -4,16 +4,39 @@ from kivy.uix.button import Button
 from kivy.uix.label import Label
 from kivy.uix.popup import Popup
 from kivy.uix.textinput import TextInput
+from kivy.uix.checkbox import CheckBox
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.scrollview import ScrollView
 from kivy.core.audio import SoundLoader
+from kivy.clock import Clock
+import threading
 from modules.camera_scanner import CameraScanner
-import json
-import os
+from modules.tiled_decoder import TiledDecoder
+from modules.widget_pool import RowPool, ListPopup
+from modules.line_queue import LineNumberQueue
+from modules.scanner_inputs import ScanHub, CameraSource, KeyboardWedgeSource
+from file_management.file_manager import InventoryManager
+from file_management.inventory_loader import InventoryFormatError
+
+
+# Cameras used by the packing station mode; cameras that are not connected are skipped
+STATION_CAMERA_INDICES = (0, 1, 2)
 
 
 class ShelfManagementScreen(Screen):
-    def __init__(self, json_file_path, **kwargs):
+    def __init__(self, json_file_path, inventory=None, **kwargs):
         super().__init__(**kwargs)
         self.json_file_path = json_file_path
+        self.inventory = inventory or InventoryManager(json_file_path)
+
+        # Reusable shelf views and row pools, so refreshing a view does not rebuild it
+        self.shelf_rows = RowPool(self.create_shelf_row)
+        self.nested_shelf_rows = RowPool(self.create_nested_shelf_row)
+        self.shelves_view = None
+        self.nested_shelves_view = None
+
+        # Decodes whole-shelf photos across a process pool (started on first use)
+        self.tiled_decoder = TiledDecoder()
 
         # Layout for Shelf Management screen
         layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
@@ -25,6 +48,20 @@ class ShelfManagementScreen(Screen):
         layout.add_widget(Button(text="Add New Location", on_press=self.add_location_popup))
         layout.add_widget(Button(text="Remove Location", on_press=self.remove_location_popup))
 
+        # Undo/redo of shelf changes, including removals, clears and moves
+        history_box = BoxLayout(orientation='horizontal', spacing=10)
+        self.undo_button = Button(text="Undo", on_press=self.undo_change, disabled=True)
+        self.redo_button = Button(text="Redo", on_press=self.redo_change, disabled=True)
+        history_box.add_widget(self.undo_button)
+        history_box.add_widget(self.redo_button)
+        layout.add_widget(history_box)
+
+        # Hyphenless scans wait here for their line numbers instead of blocking the scanner
+        self.line_queue = LineNumberQueue()
+        self.assign_lines_button = Button(text="Assign Line Numbers (0)", on_press=self.assign_line_numbers)
+        self.scan_assign_button = None
+        layout.add_widget(self.assign_lines_button)
+
         # Status indicator
         self.status_label = Label(text="Status: Ready")
         layout.add_widget(self.status_label)
@@ -32,29 +69,79 @@ class ShelfManagementScreen(Screen):
         self.add_widget(layout)
 
     def load_json_data(self):
-        """Utility function to load JSON data."""
-        if os.path.exists(self.json_file_path):
-            with open(self.json_file_path, 'r') as file:
-                return json.load(file)
-        return {"locations": {}}
-
-    def save_json_data(self, data):
-        """Utility function to save JSON data."""
-        with open(self.json_file_path, 'w') as file:
-            json.dump(data, file, indent=4)
+        """Utility function to get the inventory data, loading the JSON file on first use."""
+        return self.inventory.ensure_loaded()
+
+    def inventory_ready(self):
+        """Load the inventory if needed, reporting a malformed file in the status label instead of raising."""
+        try:
+            self.load_json_data()
+        except InventoryFormatError as error:
+            self.status_label.text = f"JSON file could not be read: {error}"
+            return False
+        return True
+
+    def save_json_data(self):
+        """Utility function to save the inventory data."""
+        self.inventory.save()
+        self.update_history_buttons()
+
+    def update_history_buttons(self):
+        """Enable Undo/Redo only when there is something to undo or redo."""
+        self.undo_button.disabled = not self.inventory.history.can_undo()
+        self.redo_button.disabled = not self.inventory.history.can_redo()
+
+    def undo_change(self, instance):
+        """Revert the most recent inventory change and save the result."""
+        # A reload after an outside change clears the history, as it no longer matches the data
+        if not self.inventory_ready():
+            return
+        description = self.inventory.undo()
+        if description is None:
+            self.status_label.text = "Nothing to undo."
+        else:
+            self.status_label.text = f"Undid {description}."
+            self.save_json_data()
+            self.refresh_open_views()
+        self.update_history_buttons()
+
+    def redo_change(self, instance):
+        """Re-apply the most recently undone change and save the result."""
+        if not self.inventory_ready():
+            return
+        description = self.inventory.redo()
+        if description is None:
+            self.status_label.text = "Nothing to redo."
+        else:
+            self.status_label.text = f"Redid {description}."
+            self.save_json_data()
+            self.refresh_open_views()
+        self.update_history_buttons()
 
     def display_locations(self, instance):
         """Display current locations with an option to view shelves."""
+        if not self.inventory_ready():
+            return
         data = self.load_json_data()
         locations = data.get("locations", {})
 
         # Create layout for displaying locations
         popup_content = BoxLayout(orientation='vertical', spacing=10)
 
+        # Totals are maintained by the inventory model, so no traversal is needed here
+        stats = self.inventory.get_stats()
+        popup_content.add_widget(Label(
+            text=f"{stats['locations']} locations, {stats['shelves']} shelves, "
+                 f"{stats['nested_shelves']} nested shelves, {stats['items']} items",
+            size_hint_y=None, height=44))
+
         if locations:
             for location_name in locations.keys():
                 location_box = BoxLayout(orientation='horizontal', size_hint_y=None, height=44)
-                location_label = Label(text=location_name, size_hint_x=0.7)
+                location_label = Label(
+                    text=f"{location_name} ({len(locations[location_name])} shelves, "
+                         f"{self.inventory.location_count(location_name)} items)",
+                    size_hint_x=0.7)
                 view_shelves_button = Button(text="View Shelves", size_hint_x=0.3)
 
                 # Bind the "View Shelves" button to open the shelves of this location
@@ -76,48 +163,54 @@ class ShelfManagementScreen(Screen):
         popup.open()
 
     def view_shelves_popup(self, location_name):
-        """Popup to view shelves in the selected location."""
+        """Popup to view shelves in the selected location, refreshed in place if already open."""
         data = self.load_json_data()
         shelves = data["locations"].get(location_name, {})
 
-        # Create layout for displaying shelves
-        popup_content = BoxLayout(orientation='vertical', spacing=10)
-
-
-        if shelves:
-            for shelf_name in shelves.keys():
-                shelf_box = BoxLayout(orientation='horizontal', size_hint_y=None, height=44)
-                shelf_label = Label(text=shelf_name, size_hint_x=0.7)
-                view_nested_shelves_button = Button(text="View Nested Shelves", size_hint_x=0.3)
-                remove_shelf_button = Button(text="Remove Shelf", size_hint_x=0.3)
-                remove_shelf_button.bind(
-                    on_press=lambda btn, sh=shelf_name: self.remove_shelf(location_name, sh, popup))
-
-                # Bind the button to view nested shelves in this shelf
-                view_nested_shelves_button.bind(
-                    on_press=lambda btn, sh=shelf_name: self.view_nested_shelves_popup(location_name, sh))
-
-                shelf_box.add_widget(shelf_label)
-                shelf_box.add_widget(view_nested_shelves_button)
-                popup_content.add_widget(shelf_box)
-        else:
-            popup_content.add_widget(Label(text=f"No shelves available in '{location_name}'."))
-
-        # Add "Add Shelf" button and close button
-        add_shelf_button = Button(text="Add New Shelf", size_hint=(1, 0.2))
-        add_shelf_button.bind(on_press=lambda x: self.add_shelf_popup(location_name))
-        popup_content.add_widget(add_shelf_button)
-
-        close_button = Button(text="Close", size_hint=(1, 0.2))
-        popup_content.add_widget(close_button)
-
-        # Display the popup
-        popup = Popup(title=f"Shelves in {location_name}", content=popup_content, size_hint=(0.8, 0.8))
-        close_button.bind(on_press=popup.dismiss)
-        popup.open()
+        # One shelves popup is reused; only rows for added or removed shelves change
+        if self.shelves_view is None:
+            self.shelves_view = ListPopup(self.shelf_rows, self.update_shelf_row,
+                                          [("Add New Shelf", self.add_shelf_popup)])
+        self.shelves_view.show(f"Shelves in {location_name}", location_name, shelves.keys(),
+                               f"No shelves available in '{location_name}'.")
+
+    def create_shelf_row(self):
+        """Build a reusable shelf row; its buttons act on whichever shelf the row currently shows."""
+        shelf_box = BoxLayout(orientation='horizontal', size_hint_y=None, height=44)
+        shelf_box.shelf_label = Label(size_hint_x=0.5)
+        view_nested_shelves_button = Button(text="View Nested Shelves", size_hint_x=0.3)
+        remove_shelf_button = Button(text="Remove Shelf", size_hint_x=0.2)
+
+        # Bound once; the row's current location and shelf are looked up when pressed
+        view_nested_shelves_button.bind(
+            on_press=lambda btn: self.view_nested_shelves_popup(shelf_box.location_name, shelf_box.shelf_name))
+        remove_shelf_button.bind(
+            on_press=lambda btn: self.confirm_remove_shelf(shelf_box.location_name, shelf_box.shelf_name))
+
+        shelf_box.add_widget(shelf_box.shelf_label)
+        shelf_box.add_widget(view_nested_shelves_button)
+        shelf_box.add_widget(remove_shelf_button)
+        return shelf_box
+
+    def update_shelf_row(self, shelf_box, location_name, shelf_name):
+        """Point a pooled shelf row at a shelf and refresh its counts."""
+        shelf_box.location_name = location_name
+        shelf_box.shelf_name = shelf_name
+        nested_count = len(self.inventory.locations[location_name][shelf_name])
+        shelf_box.shelf_label.text = (f"{shelf_name} ({nested_count} nested, "
+                                      f"{self.inventory.shelf_count(location_name, shelf_name)} items)")
+
+    def refresh_open_views(self):
+        """Update any open shelf views in place after the inventory changed."""
+        if self.shelves_view is not None and self.shelves_view.is_open:
+            self.view_shelves_popup(self.shelves_view.context)
+        if self.nested_shelves_view is not None and self.nested_shelves_view.is_open:
+            self.view_nested_shelves_popup(*self.nested_shelves_view.context)
 
     def add_location_popup(self, instance):
         """Popup to add a new location."""
+        if not self.inventory_ready():
+            return
         popup_content = BoxLayout(orientation='vertical')
 
         # Text input for the location name
@@ -136,16 +229,14 @@ class ShelfManagementScreen(Screen):
 
     def add_location(self, location_name, popup):
         """Add a new location to the JSON structure."""
-        # Load existing data
-        data = self.load_json_data()
+        # Make sure the inventory is loaded
+        self.load_json_data()
 
-        # Check if the location already exists
-        if location_name in data["locations"]:
+        # Add the new location with an empty dictionary for shelves, unless it already exists
+        if not self.inventory.add_location(location_name):
             self.status_label.text = f"Location '{location_name}' already exists."
         else:
-            # Add the new location with an empty dictionary for shelves
-            data["locations"][location_name] = {}
-            self.save_json_data(data)
+            self.save_json_data()
             self.status_label.text = f"Location '{location_name}' added successfully."
 
         # Close the popup after adding the location
@@ -153,6 +244,8 @@ class ShelfManagementScreen(Screen):
 
     def remove_location_popup(self, instance):
         """Popup to select a location to remove."""
+        if not self.inventory_ready():
+            return
         data = self.load_json_data()
         locations = data.get("locations", {})
 
@@ -188,7 +281,7 @@ class ShelfManagementScreen(Screen):
         """Ask the user to confirm removal of the location."""
         popup_content = BoxLayout(orientation='vertical', spacing=10)
         popup_content.add_widget(
-            Label(text=f"Are you sure you want to delete '{location_name}'? This action cannot be undone."))
+            Label(text=f"Are you sure you want to delete '{location_name}'? You can undo this afterwards."))
 
         # Yes button to confirm deletion
         yes_button = Button(text="Yes", size_hint=(1, 0.2))
@@ -209,12 +302,11 @@ class ShelfManagementScreen(Screen):
 
     def remove_location(self, location_name, parent_popup, confirmation_popup):
         """Remove the specified location from the JSON structure."""
-        data = self.load_json_data()
+        self.load_json_data()
 
         # Check if the location exists and remove it
-        if location_name in data["locations"]:
-            del data["locations"][location_name]
-            self.save_json_data(data)
+        if self.inventory.remove_location(location_name):
+            self.save_json_data()
             self.status_label.text = f"Location '{location_name}' removed successfully."
         else:
             self.status_label.text = f"Location '{location_name}' does not exist."
@@ -222,6 +314,7 @@ class ShelfManagementScreen(Screen):
         # Close both the original location popup and the confirmation popup
         parent_popup.dismiss()
         confirmation_popup.dismiss()
+        self.refresh_open_views()
 
     def select_location_for_shelf_popup(self, instance):
         """Popup to select a location to add a new shelf."""
@@ -270,32 +363,48 @@ class ShelfManagementScreen(Screen):
 
     def add_shelf(self, location_name, shelf_name, popup):
         """Add a new shelf to the specified location in the JSON structure."""
-        data = self.load_json_data()
+        self.load_json_data()
 
-        # Check if the shelf already exists
-        if shelf_name in data["locations"][location_name]:
+        # Add the new shelf with an empty dictionary for nested shelves, unless it already exists
+        if not self.inventory.add_shelf(location_name, shelf_name):
             self.status_label.text = f"Shelf '{shelf_name}' already exists in '{location_name}'."
         else:
-            # Add the new shelf with an empty dictionary for nested shelves
-            data["locations"][location_name][shelf_name] = {}
-            self.save_json_data(data)
+            self.save_json_data()
             self.status_label.text = f"Shelf '{shelf_name}' added to '{location_name}' successfully."
 
-        # Refresh by closing and reopening the shelves popup
+        # Close the input popup and refresh the shelves popup in place
         popup.dismiss()
         self.view_shelves_popup(location_name)
 
-    def remove_shelf(self, location_name, shelf_name, popup):
+    def confirm_remove_shelf(self, location_name, shelf_name):
+        """Ask the user to confirm removal of a shelf with all of its nested shelves and items."""
+        popup_content = BoxLayout(orientation='vertical')
+        popup_content.add_widget(Label(
+            text=f"Are you sure you want to delete shelf '{shelf_name}' and all of its nested shelves? "
+                 f"You can undo this afterwards."))
+
+        # Yes and No buttons
+        yes_button = Button(text="Yes", size_hint=(1, 0.3))
+        no_button = Button(text="No", size_hint=(1, 0.3))
+        popup_content.add_widget(yes_button)
+        popup_content.add_widget(no_button)
+
+        confirm_popup = Popup(title="Confirm Deletion", content=popup_content, size_hint=(0.7, 0.4))
+        yes_button.bind(on_press=lambda instance: self.remove_shelf(location_name, shelf_name, confirm_popup))
+        no_button.bind(on_press=confirm_popup.dismiss)
+
+        confirm_popup.open()
+
+    def remove_shelf(self, location_name, shelf_name, confirm_popup):
         """Remove the specified shelf from the JSON structure."""
-        data = self.load_json_data()
-        if shelf_name in data["locations"][location_name]:
-            del data["locations"][location_name][shelf_name]
-            self.save_json_data(data)
+        self.load_json_data()
+        if self.inventory.remove_shelf(location_name, shelf_name):
+            self.save_json_data()
             self.status_label.text = f"Shelf '{shelf_name}' removed from '{location_name}' successfully."
 
-        # Refresh the shelves popup
-        popup.dismiss()
-        self.view_shelves_popup(location_name)
+        # Close the confirmation and refresh the shelves popup in place
+        confirm_popup.dismiss()
+        self.refresh_open_views()
 
     def select_shelf_for_nested_shelf_popup(self, location_name):
         """Popup to select a shelf to add a nested shelf."""
@@ -344,69 +453,69 @@ class ShelfManagementScreen(Screen):
 
     def add_nested_shelf(self, location_name, shelf_name, nested_shelf_name, popup):
         """Add a new nested shelf to the specified shelf in the JSON structure."""
-        data = self.load_json_data()
+        self.load_json_data()
 
-        # Check if the nested shelf already exists
-        if nested_shelf_name in data["locations"][location_name][shelf_name]:
+        # Add the new nested shelf with an empty list for items, unless it already exists
+        if not self.inventory.add_nested_shelf(location_name, shelf_name, nested_shelf_name):
             self.status_label.text = f"Nested shelf '{nested_shelf_name}' already exists in '{shelf_name}'."
         else:
-            # Add the new nested shelf with an empty list for items
-            data["locations"][location_name][shelf_name][nested_shelf_name] = []
-            self.save_json_data(data)
+            self.save_json_data()
             self.status_label.text = f"Nested shelf '{nested_shelf_name}' added to '{shelf_name}' successfully."
 
-        # Refresh by closing and reopening the nested shelves popup
+        # Close the input popup and refresh the nested shelves popup in place
         popup.dismiss()
         self.view_nested_shelves_popup(location_name, shelf_name)
+        if self.shelves_view is not None and self.shelves_view.is_open:
+            # The parent shelf's nested shelf count changed as well
+            self.view_shelves_popup(self.shelves_view.context)
 
     def view_nested_shelves_popup(self, location_name, shelf_name):
-        """Popup to view nested shelves in the selected shelf."""
+        """Popup to view nested shelves in the selected shelf, refreshed in place if already open."""
         data = self.load_json_data()
-        nested_shelves = data["locations"][location_name].get(shelf_name, {})
-
-        # Create layout for displaying nested shelves
-        popup_content = BoxLayout(orientation='vertical', spacing=10)
-
-        if nested_shelves:
-            for nested_shelf_name in nested_shelves.keys():
-                nested_shelf_box = BoxLayout(orientation='horizontal', size_hint_y=None, height=44)
-                nested_shelf_label = Label(text=nested_shelf_name, size_hint_x=0.4)
-
-                # Clear Shelf button
-                clear_button = Button(text="Clear Shelf", size_hint_x=0.2)
-                clear_button.bind(
-                    on_press=lambda btn, ns=nested_shelf_name: self.confirm_clear_shelf(location_name, shelf_name, ns))
-
-                # Scan Items button
-                scan_button = Button(text="Scan Items", size_hint_x=0.2)
-                scan_button.bind(
-                    on_press=lambda btn, ns=nested_shelf_name: self.scan_items(location_name, shelf_name, ns))
-
-                # Remove Nested Shelf button
-                remove_button = Button(text="Remove Shelf", size_hint_x=0.2)
-                remove_button.bind(
-                    on_press=lambda btn, ns=nested_shelf_name: self.remove_nested_shelf(location_name, shelf_name, ns))
-
-                nested_shelf_box.add_widget(nested_shelf_label)
-                nested_shelf_box.add_widget(clear_button)
-                nested_shelf_box.add_widget(scan_button)
-                nested_shelf_box.add_widget(remove_button)
-                popup_content.add_widget(nested_shelf_box)
-        else:
-            popup_content.add_widget(Label(text=f"No nested shelves in '{shelf_name}'."))
-
-        # Add "Add Nested Shelf" button and close button
-        add_nested_shelf_button = Button(text="Add New Nested Shelf", size_hint=(1, 0.2))
-        add_nested_shelf_button.bind(on_press=lambda x: self.add_nested_shelf_popup(location_name, shelf_name))
-        popup_content.add_widget(add_nested_shelf_button)
-
-        close_button = Button(text="Close", size_hint=(1, 0.2))
-        popup_content.add_widget(close_button)
-
-        # Display the popup
-        popup = Popup(title=f"Nested Shelves in {shelf_name}", content=popup_content, size_hint=(0.8, 0.8))
-        close_button.bind(on_press=popup.dismiss)
-        popup.open()
+        nested_shelves = data["locations"].get(location_name, {}).get(shelf_name, {})
+
+        # One nested shelves popup is reused; only rows for added or removed nested shelves change
+        if self.nested_shelves_view is None:
+            self.nested_shelves_view = ListPopup(
+                self.nested_shelf_rows, self.update_nested_shelf_row,
+                [("Add New Nested Shelf", lambda context: self.add_nested_shelf_popup(*context))])
+        self.nested_shelves_view.show(f"Nested Shelves in {shelf_name}", (location_name, shelf_name),
+                                      nested_shelves.keys(), f"No nested shelves in '{shelf_name}'.")
+
+    def create_nested_shelf_row(self):
+        """Build a reusable nested shelf row; its buttons act on whichever nested shelf it currently shows."""
+        nested_shelf_box = BoxLayout(orientation='horizontal', size_hint_y=None, height=44)
+        nested_shelf_box.nested_shelf_label = Label(size_hint_x=0.4)
+
+        def target():
+            return nested_shelf_box.location_name, nested_shelf_box.shelf_name, nested_shelf_box.nested_shelf_name
+
+        # Clear Shelf button
+        clear_button = Button(text="Clear Shelf", size_hint_x=0.2)
+        clear_button.bind(on_press=lambda btn: self.confirm_clear_shelf(*target()))
+
+        # Scan Items button
+        scan_button = Button(text="Scan Items", size_hint_x=0.2)
+        scan_button.bind(on_press=lambda btn: self.scan_items(*target()))
+
+        # Remove Nested Shelf button
+        remove_button = Button(text="Remove Shelf", size_hint_x=0.2)
+        remove_button.bind(on_press=lambda btn: self.remove_nested_shelf(*target()))
+
+        nested_shelf_box.add_widget(nested_shelf_box.nested_shelf_label)
+        nested_shelf_box.add_widget(clear_button)
+        nested_shelf_box.add_widget(scan_button)
+        nested_shelf_box.add_widget(remove_button)
+        return nested_shelf_box
+
+    def update_nested_shelf_row(self, nested_shelf_box, context, nested_shelf_name):
+        """Point a pooled nested shelf row at a nested shelf and refresh its count."""
+        location_name, shelf_name = context
+        nested_shelf_box.location_name = location_name
+        nested_shelf_box.shelf_name = shelf_name
+        nested_shelf_box.nested_shelf_name = nested_shelf_name
+        item_count = self.inventory.nested_shelf_count(location_name, shelf_name, nested_shelf_name)
+        nested_shelf_box.nested_shelf_label.text = f"{nested_shelf_name} ({item_count} items)"
 
     def remove_nested_shelf(self, location_name, shelf_name, nested_shelf_name):
         """Prompt to confirm and delete a nested shelf if the user confirms."""
@@ -434,18 +543,18 @@ class ShelfManagementScreen(Screen):
     def confirm_delete_nested_shelf(self, location_name, shelf_name, nested_shelf_name, popup):
         """Delete the nested shelf after confirmation."""
         # Load data and remove the specified nested shelf
-        data = self.load_json_data()
-        if nested_shelf_name in data["locations"][location_name][shelf_name]:
-            del data["locations"][location_name][shelf_name][nested_shelf_name]
-            self.save_json_data(data)
+        self.load_json_data()
+        if self.inventory.remove_nested_shelf(location_name, shelf_name, nested_shelf_name):
+            self.save_json_data()
             self.status_label.text = f"Nested shelf '{nested_shelf_name}' has been deleted successfully."
         popup.dismiss()
+        self.refresh_open_views()
 
     def scan_items(self, location_name, shelf_name, nested_shelf_name):
         """Use the camera to scan and continuously add items to the specified nested shelf."""
 
         def handle_barcode_data(barcode_data):
-            self.process_scanned_item(barcode_data, location_name, shelf_name, nested_shelf_name)
+            self.process_scanned_item(barcode_data, location_name, shelf_name, nested_shelf_name, sighting=True)
 
         # Set up the CameraScanner widget with handle_barcode_data as the callback
         scanner_widget = CameraScanner(scan_callback=handle_barcode_data)
@@ -458,16 +567,214 @@ class ShelfManagementScreen(Screen):
             on_press=lambda x: self.manual_entry_popup(location_name, shelf_name, nested_shelf_name, scanner_widget))
         popup_content.add_widget(manual_entry_button)
 
+        # Add a Capture Shelf button to register every label in one photo
+        capture_button = Button(text="Capture Shelf", size_hint=(1, 0.1))
+        capture_button.bind(
+            on_press=lambda x: self.capture_shelf(location_name, shelf_name, nested_shelf_name, scanner_widget))
+        popup_content.add_widget(capture_button)
+
+        # Add a Station Mode button to scan with every connected camera and wedge scanner at once
+        station_button = Button(text="Station Mode (All Scanners)", size_hint=(1, 0.1))
+        station_button.bind(on_press=lambda x: self.open_station_mode(
+            location_name, shelf_name, nested_shelf_name, scanner_popup))
+        popup_content.add_widget(station_button)
+
+        # Add an Assign Line Numbers button for queued hyphenless scans
+        self.scan_assign_button = Button(text=f"Assign Line Numbers ({len(self.line_queue)})", size_hint=(1, 0.1))
+        self.scan_assign_button.bind(on_press=self.assign_line_numbers)
+        popup_content.add_widget(self.scan_assign_button)
+
         # Add a Close button
         close_button = Button(text="Close", size_hint=(1, 0.1))
         close_button.bind(on_press=lambda x: scanner_popup.dismiss())
         popup_content.add_widget(close_button)
 
+        def on_dismiss(instance):
+            scanner_widget.release_camera()
+            self.scan_assign_button = None
+
         # Display the camera scanner in a popup with the Manual Entry and Close buttons
         scanner_popup = Popup(title="Scan Items", content=popup_content, size_hint=(0.9, 0.9))
-        scanner_popup.bind(on_dismiss=lambda x: scanner_widget.release_camera())
+        scanner_popup.bind(on_dismiss=on_dismiss)
         scanner_popup.open()
 
+    def open_station_mode(self, location_name, shelf_name, nested_shelf_name, scanner_popup):
+        """Scan into the nested shelf from several cameras and wedge scanners concurrently."""
+        # Free the preview camera so the station can open it
+        scanner_popup.dismiss()
+
+        popup_content = BoxLayout(orientation='vertical', spacing=10)
+
+        # USB wedge scanners type into this field and press Enter; it must keep focus after each Enter
+        wedge_input = TextInput(hint_text="Wedge scanners type here", multiline=False, text_validate_unfocus=False,
+                                size_hint=(1, 0.15))
+        popup_content.add_widget(wedge_input)
+
+        source_label = Label(size_hint=(1, 0.15))
+        popup_content.add_widget(source_label)
+
+        event_list = GridLayout(cols=1, spacing=2, size_hint_y=None)
+        event_list.bind(minimum_height=event_list.setter('height'))
+        scroll_view = ScrollView()
+        scroll_view.add_widget(event_list)
+        popup_content.add_widget(scroll_view)
+
+        close_button = Button(text="Close", size_hint=(1, 0.1))
+        popup_content.add_widget(close_button)
+
+        def update_source_label():
+            parts = [source.error or f"{source.source_id}: {hub.counts[source.source_id]}" for source in hub.sources]
+            source_label.text = "  |  ".join(parts)
+
+        def apply_events(events):
+            # Runs on the main thread only, so the inventory is never written concurrently
+            self.apply_scan_events(events, location_name, shelf_name, nested_shelf_name)
+            for event in events:
+                event_list.add_widget(Label(text=f"{event.barcode_data}  ({event.source_id})",
+                                            size_hint_y=None, height=28), index=len(event_list.children))
+            # Newest events are shown on top; only keep the most recent ones
+            while len(event_list.children) > 200:
+                event_list.remove_widget(event_list.children[0])
+            update_source_label()
+
+        hub = ScanHub(apply_events)
+        for camera_index in STATION_CAMERA_INDICES:
+            hub.add_source(CameraSource(camera_index))
+        hub.add_source(KeyboardWedgeSource(wedge_input))
+        hub.start()
+        # Camera errors are only known once their threads have tried to open them
+        Clock.schedule_once(lambda dt: update_source_label(), 1)
+        update_source_label()
+
+        station_popup = Popup(title=f"Station Mode: {nested_shelf_name}", content=popup_content,
+                              size_hint=(0.9, 0.9))
+        close_button.bind(on_press=station_popup.dismiss)
+        station_popup.bind(on_dismiss=lambda x: hub.stop())
+        station_popup.open()
+        wedge_input.focus = True
+
+    def apply_scan_events(self, events, location_name, shelf_name, nested_shelf_name):
+        """Apply a batch of merged scanner events to the nested shelf with a single save."""
+        self.load_json_data()
+        added = 0
+        # One undo step per batch rather than per scan
+        with self.inventory.batch(f"scan items into '{nested_shelf_name}'"):
+            for event in events:
+                if "-" not in event.barcode_data:
+                    self.process_scanned_item(event.barcode_data, location_name, shelf_name, nested_shelf_name)
+                    continue
+                try:
+                    previous_path = self.inventory.add_item(location_name, shelf_name, nested_shelf_name,
+                                                            event.barcode_data)
+                except KeyError:
+                    self.status_label.text = f"'{nested_shelf_name}' in '{shelf_name}' no longer exists."
+                    break
+                if previous_path != (location_name, shelf_name, nested_shelf_name):
+                    added += 1
+        if added:
+            self.save_json_data()
+            self.status_label.text = f"Added {added} items to '{nested_shelf_name}' in '{shelf_name}'."
+            self.refresh_open_views()
+
+    def capture_shelf(self, location_name, shelf_name, nested_shelf_name, scanner_widget):
+        """Photograph a whole shelf face or tote and decode all its labels in the background."""
+        # Stop per-frame scanning so the live feed does not add items while the photo is reviewed
+        scanner_widget.pause_camera()
+        frame = scanner_widget.capture_still()
+        if frame is None:
+            self.status_label.text = "Could not capture a photo from the camera."
+            scanner_widget.resume_camera()
+            return
+
+        self.status_label.text = "Decoding shelf photo..."
+
+        def worker():
+            try:
+                barcodes = self.tiled_decoder.decode(frame)
+            except Exception as error:  # a failed decode must not leave the camera paused
+                message = str(error)  # the except variable does not outlive the block
+                Clock.schedule_once(lambda dt: self.on_capture_failed(message, scanner_widget))
+                return
+            Clock.schedule_once(lambda dt: self.review_captured_items(
+                barcodes, location_name, shelf_name, nested_shelf_name, scanner_widget))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def on_capture_failed(self, error, scanner_widget):
+        self.status_label.text = f"Could not decode the shelf photo: {error}"
+        scanner_widget.resume_camera()
+
+    def review_captured_items(self, barcodes, location_name, shelf_name, nested_shelf_name, scanner_widget):
+        """List the labels found in a shelf photo so the operator can untick any before committing them."""
+        self.status_label.text = f"Found {len(barcodes)} labels in the shelf photo."
+
+        item_list = GridLayout(cols=1, spacing=5, size_hint_y=None)
+        item_list.bind(minimum_height=item_list.setter('height'))
+        checkboxes = []
+
+        for barcode in barcodes:
+            item_box = BoxLayout(orientation='horizontal', size_hint_y=None, height=36)
+            checkbox = CheckBox(size_hint_x=0.15, active=True)
+            text = barcode
+            if "-" not in barcode:
+                text += " (line number assigned afterwards)"
+            else:
+                current_path = self.inventory.index.get(barcode)
+                if current_path is not None and current_path != (location_name, shelf_name, nested_shelf_name):
+                    text += f" (moves from {current_path[2]} in {current_path[1]})"
+            item_box.add_widget(checkbox)
+            item_box.add_widget(Label(text=text, size_hint_x=0.85))
+            item_list.add_widget(item_box)
+            checkboxes.append((checkbox, barcode))
+
+        scroll_view = ScrollView()
+        scroll_view.add_widget(item_list)
+
+        popup_content = BoxLayout(orientation='vertical', spacing=10)
+        popup_content.add_widget(scroll_view)
+        confirm_button = Button(text="Add Selected Items", size_hint=(1, 0.1))
+        cancel_button = Button(text="Cancel", size_hint=(1, 0.1))
+        popup_content.add_widget(confirm_button)
+        popup_content.add_widget(cancel_button)
+
+        review_popup = Popup(title=f"Captured Items for {nested_shelf_name}", content=popup_content,
+                             size_hint=(0.9, 0.9))
+
+        def on_confirm(instance):
+            selected = [barcode for checkbox, barcode in checkboxes if checkbox.active]
+            self.commit_captured_items(selected, location_name, shelf_name, nested_shelf_name)
+            review_popup.dismiss()
+
+        confirm_button.bind(on_press=on_confirm)
+        cancel_button.bind(on_press=review_popup.dismiss)
+        review_popup.bind(on_dismiss=lambda x: scanner_widget.resume_camera())
+        review_popup.open()
+
+    def commit_captured_items(self, barcodes, location_name, shelf_name, nested_shelf_name):
+        """Add a reviewed batch of items to the nested shelf with a single save."""
+        if not barcodes:
+            self.status_label.text = "No items selected."
+            return
+
+        # Labels without a line number join the pending queue for this nested shelf
+        for barcode in barcodes:
+            if "-" not in barcode:
+                self.process_scanned_item(barcode, location_name, shelf_name, nested_shelf_name)
+        barcodes = [barcode for barcode in barcodes if "-" in barcode]
+
+        self.load_json_data()
+        moved = self.inventory.add_items(location_name, shelf_name, nested_shelf_name, barcodes)
+        self.save_json_data()
+
+        success_sound = SoundLoader.load('assets/beep.mp3')
+        if success_sound:
+            success_sound.play()
+
+        self.status_label.text = (f"Added {len(barcodes)} items to '{nested_shelf_name}' in '{shelf_name}' "
+                                  f"({moved} moved from other shelves, {len(self.line_queue)} waiting for "
+                                  f"line numbers).")
+        self.refresh_open_views()
+
     def manual_entry_popup(self, location_name, shelf_name, nested_shelf_name, scanner_widget):
         """Open a popup to manually enter the order number and line number."""
         # Pause the camera while entering data manually
@@ -499,119 +806,111 @@ class ShelfManagementScreen(Screen):
         # Open the manual entry popup
         manual_popup.open()
 
-    def process_barcode(self, barcode_data, callback):
-        """Process barcode data to ensure consistent format."""
+    def process_barcode(self, barcode_data, callback, description="", target=None, sighting=False):
+        """Process barcode data to ensure consistent format.
+
+        Complete barcodes go to callback right away; hyphenless ones are queued for a line number and
+        applied to target once it is assigned. sighting=True marks a live camera read.
+        """
+        if not barcode_data:
+            return
         if "-" in barcode_data:
             # Barcode is already in the correct format
             callback(barcode_data)
+        elif self.line_queue.add(barcode_data, description, target, sighting):
+            # Barcode missing hyphen; queue it for a line number so scanning can continue
+            self.status_label.text = (f"Order '{barcode_data[:10]}' queued for a line number "
+                                      f"({len(self.line_queue)} pending).")
+            self.update_pending_count()
         else:
-            # Barcode missing hyphen; prompt for line number
-            order_number = barcode_data[:10]  # First 10 digits as order number
-            self.prompt_line_number(order_number, callback)
-
-    def prompt_line_number(self, order_number, callback):
-        """Prompt the user to enter a line number and process the item with it."""
-
-        # Ensure any existing popup is dismissed
-        if hasattr(self, 'line_popup'):
-            self.line_popup.dismiss()  # Dismiss any existing instance
-
-        line_popup_content = BoxLayout(orientation='vertical')
-        line_input = TextInput(hint_text="Enter line number",
-                               multiline=False)  # Keeps it single line without Enter adding \n
-        submit_button = Button(text="Submit")
-
-        line_popup_content.add_widget(line_input)
-        line_popup_content.add_widget(submit_button)
-
-        self.line_popup = Popup(title="Enter Line Number", content=line_popup_content, size_hint=(0.6, 0.4))
-
-        # Define what happens on submit button press or Enter key
-        def on_submit(instance):
-            line_number = line_input.text
-            self.finalize_barcode(order_number, line_number, callback, self.line_popup)
-
-        # Bind both the submit button and Enter key to finalize_barcode
-        submit_button.bind(on_press=on_submit)
-        line_input.bind(on_text_validate=on_submit)  # Trigger submit on Enter key
-
-        # Open popup and add debug statements
-        print("Opening line number popup.")  # Debug: print when opening
-        self.line_popup.bind(on_dismiss=lambda x: print("Line number popup dismissed."))  # Debug for dismissal
-        self.line_popup.open()
-
-    def finalize_barcode(self, order_number, line_number, callback, popup):
-        """Combine order number and line number, play sound, and display success message."""
-        processed_barcode = f"{order_number}-{line_number}"
-        callback(processed_barcode)
-        popup.dismiss()
-
-        # Play success tone from assets
-        success_sound = SoundLoader.load('assets/beep.mp3')
-        if success_sound:
-            success_sound.play()
-
-        # Display success message
-        self.status_label.text = f"Item '{processed_barcode}' successfully added to the nested shelf."
-
-    def set_line_number(self, line_number, popup):
-        """Set the line number and dismiss the popup."""
-        self._line_number = line_number
-        popup.dismiss()
-
-    def process_scanned_item(self, barcode_data, location_name, shelf_name, nested_shelf_name):
-        """Process scanned barcode and add/move the item to the nested shelf."""
+            self.status_label.text = (f"Order '{barcode_data[:10]}' is still in view, repeat sighting ignored "
+                                      f"({len(self.line_queue)} pending).")
+
+    def update_pending_count(self):
+        """Show the number of scans waiting for a line number on the assign buttons."""
+        text = f"Assign Line Numbers ({len(self.line_queue)})"
+        self.assign_lines_button.text = text
+        if self.scan_assign_button is not None:
+            self.scan_assign_button.text = text
+
+    def assign_line_numbers(self, instance):
+        """Open the batch screen for all queued hyphenless scans."""
+        if not self.line_queue:
+            self.status_label.text = "No scans are waiting for a line number."
+            return
+        self.load_json_data()
+        self.line_queue.open_assign_popup(self.inventory.lines_for_order, self.on_line_numbers_assigned,
+                                          self.inventory.has_nested_shelf)
+
+    def on_line_numbers_assigned(self, assigned, dropped):
+        """Add a finished batch of line-numbered items as one undo step with a single save."""
+        self.update_pending_count()
+        added = 0
+        with self.inventory.batch("assign line numbers"):
+            for scan, barcode in assigned:
+                try:
+                    self.inventory.add_item(*scan.target, barcode)
+                except KeyError:
+                    dropped.append(scan)
+                    continue
+                added += 1
+        if added:
+            self.save_json_data()
+            self.refresh_open_views()
+            # Play success tone from assets
+            success_sound = SoundLoader.load('assets/beep.mp3')
+            if success_sound:
+                success_sound.play()
+        self.status_label.text = (f"{added} items added with line numbers, "
+                                  f"{len(self.line_queue)} still pending.")
+        if dropped:
+            self.status_label.text += f" {len(dropped)} dropped because their shelf no longer exists."
+
+    def process_scanned_item(self, barcode_data, location_name, shelf_name, nested_shelf_name, sighting=False):
+        """Process scanned barcode and add/move the item to the nested shelf (sighting: live camera read)."""
 
         def on_barcode_processed(parsed_barcode):
-            # Existing logic to handle moving or adding the parsed barcode
-            data = self.load_json_data()
-            item_found = False
-
-            # Check if item exists elsewhere and move if necessary
-            for loc, shelves in data["locations"].items():
-                for sh, nested_shelves in shelves.items():
-                    for ns, items in nested_shelves.items():
-                        if parsed_barcode in items:
-                            items.remove(parsed_barcode)
-                            self.status_label.text = f"Item '{parsed_barcode}' moved from '{ns}' in '{sh}'."
-                            item_found = True
-                            break
-                    if item_found:
-                        break
-                if item_found:
-                    break
-
-            # Add the item to the new nested shelf
-            nested_shelf = data["locations"][location_name][shelf_name][nested_shelf_name]
-            nested_shelf.append(parsed_barcode)
-            self.save_json_data(data)
+            # The inventory index finds the item's current shelf without scanning the whole file
+            self.load_json_data()
+            try:
+                previous_path = self.inventory.add_item(location_name, shelf_name, nested_shelf_name, parsed_barcode)
+            except KeyError:
+                self.status_label.text = (f"'{nested_shelf_name}' in '{shelf_name}' no longer exists, "
+                                          f"item '{parsed_barcode}' was not added.")
+                return
+            if previous_path == (location_name, shelf_name, nested_shelf_name):
+                # Repeat sightings of a label already on this shelf change nothing, so nothing is saved
+                self.status_label.text = f"Item '{parsed_barcode}' is already in '{nested_shelf_name}'."
+                return
+            self.save_json_data()
             self.status_label.text = f"Item '{parsed_barcode}' moved to '{nested_shelf_name}' in '{shelf_name}'."
+            self.refresh_open_views()
 
         # Call process_barcode with the barcode data and the callback
-        self.process_barcode(barcode_data, on_barcode_processed)
+        self.process_barcode(barcode_data, on_barcode_processed, f"-> {nested_shelf_name} in {shelf_name}",
+                             (location_name, shelf_name, nested_shelf_name), sighting)
 
 
     def clear_shelf(self, location_name, shelf_name, nested_shelf_name, confirmation_popup):
         """Clear all items from the specified nested shelf without deleting the shelf."""
-        data = self.load_json_data()
+        self.load_json_data()
 
-        # Access the nested shelf and clear its items
-        nested_shelf = data["locations"][location_name][shelf_name].get(nested_shelf_name, [])
-        if nested_shelf:
-            nested_shelf.clear()
-            self.save_json_data(data)
+        # Clear the nested shelf's items
+        if self.inventory.clear_nested_shelf(location_name, shelf_name, nested_shelf_name):
+            self.save_json_data()
             self.status_label.text = f"Cleared all items from '{nested_shelf_name}' in '{shelf_name}'."
         else:
             self.status_label.text = f"No items to clear in '{nested_shelf_name}'."
 
-        # Close the confirmation popup after clearing
+        # Close the confirmation popup after clearing and update the item counts in place
         confirmation_popup.dismiss()
+        self.refresh_open_views()
 
     def confirm_clear_shelf(self, location_name, shelf_name, nested_shelf_name):
         """Popup to confirm clearing all items from a nested shelf."""
         popup_content = BoxLayout(orientation='vertical', spacing=10)
         popup_content.add_widget(Label(
-            text=f"Are you sure you want to clear all items from '{nested_shelf_name}' in '{shelf_name}'? This cannot be undone."))
+            text=f"Are you sure you want to clear all items from '{nested_shelf_name}' in '{shelf_name}'? You can undo this afterwards."))
 
         # Define the popup first so we can reference it within button bindings
         confirmation_popup = Popup(title="Confirm Clear Shelf", content=popup_content, size_hint=(0.8, 0.4))
@@ -0,0 +1,222 @@
+import copy
+import random
+
+import pytest
+
+from file_management.file_manager import InventoryManager
+from file_management.history import HistoryEntry, InventoryHistory
+
+STAT_ATTRIBUTES = ("index", "order_lines", "location_counts", "shelf_counts",
+                   "total_items", "total_shelves", "total_nested_shelves")
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    inventory = InventoryManager(str(tmp_path / "inventory.json"))
+    inventory.load()
+    return inventory
+
+
+def assert_stats_consistent(inventory, tmp_path):
+    rebuilt = InventoryManager(str(tmp_path / "unused.json"))
+    rebuilt.data = copy.deepcopy(inventory.data)
+    rebuilt._rebuild_stats()
+    for attribute in STAT_ATTRIBUTES:
+        assert getattr(inventory, attribute) == getattr(rebuilt, attribute), attribute
+
+
+def nested_shelves(inventory):
+    return [(loc, shelf, nested) for loc, shelves in inventory.locations.items()
+            for shelf, nested_shelves in shelves.items() for nested in nested_shelves]
+
+
+def test_random_changes_undo_and_redo_keep_stats_consistent(inventory, tmp_path):
+    rng = random.Random(7)
+    for _ in range(1500):
+        choice = rng.random()
+        locations = inventory.locations
+        paths = nested_shelves(inventory)
+        if choice < 0.1:
+            inventory.add_location(f"L{rng.randint(0, 4)}")
+        elif choice < 0.2 and locations:
+            inventory.add_shelf(rng.choice(list(locations)), f"S{rng.randint(0, 3)}")
+        elif choice < 0.3 and locations:
+            shelves = [(loc, shelf) for loc in locations for shelf in locations[loc]]
+            if shelves:
+                inventory.add_nested_shelf(*rng.choice(shelves), f"N{rng.randint(0, 3)}")
+        elif choice < 0.7 and paths:
+            inventory.add_item(*rng.choice(paths), f"{rng.randint(0, 30)}-{rng.randint(1, 3)}")
+        elif choice < 0.75 and paths:
+            inventory.clear_nested_shelf(*rng.choice(paths))
+        elif choice < 0.78 and locations:
+            inventory.remove_location(rng.choice(list(locations)))
+        elif choice < 0.81 and paths:
+            inventory.remove_nested_shelf(*rng.choice(paths))
+        elif choice < 0.9:
+            inventory.undo()
+        else:
+            inventory.redo()
+        assert_stats_consistent(inventory, tmp_path)
+
+    final = copy.deepcopy(inventory.data)
+    while inventory.undo():
+        pass
+    assert inventory.data == {"locations": {}}
+    assert_stats_consistent(inventory, tmp_path)
+
+    while inventory.redo():
+        pass
+    assert inventory.data == final
+    assert_stats_consistent(inventory, tmp_path)
+
+
+def test_undo_clear_restores_the_same_list(inventory):
+    inventory.add_location("L")
+    inventory.add_shelf("L", "S")
+    inventory.add_nested_shelf("L", "S", "N")
+    inventory.add_items("L", "S", "N", [f"{i}-1" for i in range(5000)])
+    items = inventory.locations["L"]["S"]["N"]
+
+    assert inventory.clear_nested_shelf("L", "S", "N") == 5000
+    assert inventory.undo() == "clear 'N'"
+    assert inventory.locations["L"]["S"]["N"] is items
+    assert inventory.total_items == 5000
+
+
+def test_undo_restores_positions(inventory):
+    for location_name in ("A", "B", "C"):
+        inventory.add_location(location_name)
+    inventory.add_shelf("B", "S")
+    inventory.add_nested_shelf("B", "S", "N")
+    inventory.add_items("B", "S", "N", ["1-1", "2-1", "3-1"])
+    inventory.add_nested_shelf("B", "S", "M")
+
+    inventory.add_item("B", "S", "M", "2-1")
+    inventory.undo()
+    assert inventory.locations["B"]["S"]["N"] == ["1-1", "2-1", "3-1"]
+
+    inventory.remove_location("B")
+    inventory.undo()
+    assert list(inventory.locations) == ["A", "B", "C"]
+
+
+def test_batch_is_one_undo_step(inventory):
+    inventory.add_location("L")
+    inventory.add_shelf("L", "S")
+    inventory.add_nested_shelf("L", "S", "N")
+    inventory.add_items("L", "S", "N", ["1-1", "2-1", "3-1"])
+
+    inventory.undo()
+    assert inventory.locations["L"]["S"]["N"] == []
+
+
+def test_add_item_to_missing_shelf_changes_nothing(inventory):
+    inventory.add_location("L")
+    inventory.add_shelf("L", "S")
+    inventory.add_nested_shelf("L", "S", "N")
+    inventory.add_item("L", "S", "N", "1-1")
+    undo_depth = len(inventory.history.undo_stack)
+
+    with pytest.raises(KeyError):
+        inventory.add_item("Gone", "S", "N", "1-1")
+    assert inventory.locations["L"]["S"]["N"] == ["1-1"]
+    assert inventory.index["1-1"] == ("L", "S", "N")
+    assert len(inventory.history.undo_stack) == undo_depth
+
+
+def test_rescanning_an_item_on_its_shelf_records_nothing(inventory):
+    inventory.add_location("L")
+    inventory.add_shelf("L", "S")
+    inventory.add_nested_shelf("L", "S", "N")
+    inventory.add_item("L", "S", "N", "1-1")
+    inventory.save()
+    undo_depth = len(inventory.history.undo_stack)
+
+    for _ in range(5):
+        assert inventory.add_item("L", "S", "N", "1-1") == ("L", "S", "N")
+    assert len(inventory.history.undo_stack) == undo_depth
+    assert inventory.locations["L"]["S"]["N"] == ["1-1"]
+    assert inventory._changed_locations == set()
+
+
+def assert_duplicates_indexed(inventory):
+    """Every stored copy is either the one the index points at or a remembered duplicate."""
+    holders = {}
+    for path in nested_shelves(inventory):
+        for barcode in inventory.locations[path[0]][path[1]][path[2]]:
+            holders.setdefault(barcode, []).append(path)
+    assert set(inventory.index) == set(holders)
+    for barcode, paths in holders.items():
+        indexed = [inventory.index[barcode]] + inventory._duplicate_paths.get(barcode, [])
+        assert sorted(indexed) == sorted(paths), barcode
+    assert set(inventory.order_lines) == {barcode.partition("-")[0] for barcode in holders}
+
+
+def test_removing_one_copy_of_a_duplicate_keeps_the_other_indexed(inventory):
+    inventory.replace_data({"locations": {"L": {"S": {"N": ["1-1", "2-1"], "M": ["1-1"]}}}})
+    assert inventory.index["1-1"] == ("L", "S", "N")
+
+    inventory.remove_nested_shelf("L", "S", "N")
+    assert inventory.index["1-1"] == ("L", "S", "M")
+    assert inventory.lines_for_order("1") == ["1"]
+
+    inventory.clear_nested_shelf("L", "S", "M")
+    assert "1-1" not in inventory.index
+    assert inventory.lines_for_order("1") == []
+
+    inventory.undo()
+    inventory.undo()
+    assert_duplicates_indexed(inventory)
+
+
+def test_random_changes_with_duplicates_keep_every_copy_indexed(inventory):
+    rng = random.Random(11)
+    inventory.replace_data({"locations": {
+        "L0": {"S0": {"N0": ["1-1", "2-1", "1-1"], "N1": ["1-1", "3-1"]}},
+        "L1": {"S0": {"N0": ["2-1", "3-1"], "N1": []}},
+    }})
+    assert_duplicates_indexed(inventory)
+    for _ in range(500):
+        choice = rng.random()
+        paths = nested_shelves(inventory)
+        if choice < 0.4 and paths:
+            inventory.add_item(*rng.choice(paths), f"{rng.randint(1, 4)}-1")
+        elif choice < 0.5 and paths:
+            inventory.clear_nested_shelf(*rng.choice(paths))
+        elif choice < 0.6 and paths:
+            inventory.remove_nested_shelf(*rng.choice(paths))
+        elif choice < 0.8:
+            inventory.undo()
+        else:
+            inventory.redo()
+        assert_duplicates_indexed(inventory)
+
+
+def test_new_change_discards_redo(inventory):
+    inventory.add_location("A")
+    inventory.undo()
+    inventory.add_location("B")
+
+    assert inventory.redo() is None
+    assert list(inventory.locations) == ["B"]
+
+
+def test_load_clears_history(inventory):
+    inventory.add_location("A")
+    inventory.save()
+    inventory.load()
+
+    assert inventory.undo() is None
+
+
+def test_history_is_bounded_by_cost():
+    history = InventoryHistory(max_cost=10)
+    for cost in (4, 4, 4):
+        history.push(HistoryEntry("change", [], [], cost))
+
+    assert [entry.cost for entry in history.undo_stack] == [4, 4]
+    assert history.total_cost == 8
+
+    history.push(HistoryEntry("huge change", [], [], 50))
+    assert history.undo_stack == []
+    assert history.total_cost == 0
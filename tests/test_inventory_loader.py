@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from file_management.inventory_loader import InventoryFormatError, load_inventory_stream
+from modules.utils import build_barcode_index
+
+CHUNK_SIZES = [1, 2, 3, 7, 64, 1 << 16]
+
+VALID_DOCUMENTS = [
+    {"locations": {}},
+    {"locations": {"Warehouse": {"Shelf 1": {"Bin A": ["1234567890-1", "1234567890-2"], "Bin B": []}},
+                   "Store": {}}},
+    {"locations": {"Ünïcode é 📦": {"S\"1\\": {"N\t1": ["é-1", "a/b-2"]}}}},
+    {"version": 3, "ratio": -1.5e-3, "flags": [True, False, None], "nested": {"a": [1, {"b": "c"}]},
+     "locations": {"L": {"S": {"N": ["x-1"]}}}, "after": "locations"},
+]
+
+
+def write(tmp_path, text, encoding="utf-8"):
+    path = tmp_path / "inventory.json"
+    path.write_bytes(text.encode(encoding) if isinstance(text, str) else text)
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("document", VALID_DOCUMENTS)
+@pytest.mark.parametrize("indent", [None, 4])
+def test_valid_documents_match_json_loads(tmp_path, document, chunk_size, indent):
+    text = json.dumps(document, indent=indent, ensure_ascii=indent is None)
+    result = load_inventory_stream(write(tmp_path, text), chunk_size=chunk_size)
+
+    assert result.data == json.loads(text)
+    assert result.index == build_barcode_index(result.data)
+    assert result.is_valid
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("text", [
+    "",
+    '{"locations": {}',
+    '{"locations": {}} extra',
+    '{"locations": {"L": {"S": {"N": ["x-1",]}}}}',
+    '{"locations": {"L": {"S": {"N": ["unterminated]}}}}',
+    '{"locations" {}}',
+    '{"version": 01, "locations": {}}',
+    '{"version": tru, "locations": {}}',
+    '{"locations": {"L": {"S": {"N": ["bad \\x escape"]}}}}',
+])
+def test_invalid_json_raises_format_error(tmp_path, text, chunk_size):
+    with pytest.raises(ValueError):
+        json.loads(text)  # the case itself must be invalid JSON
+    with pytest.raises(InventoryFormatError):
+        load_inventory_stream(write(tmp_path, text), chunk_size=chunk_size)
+
+
+def test_non_object_document_raises_format_error(tmp_path):
+    with pytest.raises(InventoryFormatError):
+        load_inventory_stream(write(tmp_path, "[]"))
+
+
+def test_invalid_utf8_raises_format_error(tmp_path):
+    path = write(tmp_path, b'{"locations": {"\xff": {}}}')
+    with pytest.raises(InventoryFormatError):
+        load_inventory_stream(path, chunk_size=4)
+
+
+def test_structure_errors_are_reported_and_skipped(tmp_path):
+    document = {"locations": {"L": {"S": {"N": ["a-1", 5, "b-2"], "Bad": "not a list"}, "T": []}}}
+    result = load_inventory_stream(write(tmp_path, json.dumps(document)))
+
+    assert result.data == {"locations": {"L": {"S": {"N": ["a-1", "b-2"]}}}}
+    assert len(result.errors) == 3
+
+
+def test_duplicate_barcodes_keep_first_location(tmp_path):
+    document = {"locations": {"L": {"S": {"N": ["a-1", "a-1"], "M": ["a-1"]}}}}
+    result = load_inventory_stream(write(tmp_path, json.dumps(document)))
+
+    assert result.data == document
+    assert result.index == {"a-1": ("L", "S", "N")}
+    assert len(result.errors) == 2
+
+
+def test_duplicate_names_keep_first_entry(tmp_path):
+    text = '{"locations": {"L": {"S": {"N": ["a-1"]}}, "L": {"S": {"N": ["b-1"]}}}}'
+    result = load_inventory_stream(write(tmp_path, text))
+
+    assert result.data == {"locations": {"L": {"S": {"N": ["a-1"]}}}}
+    assert result.index == {"a-1": ("L", "S", "N")}
+    assert len(result.errors) == 1
+
+
+def test_progress_reaches_total(tmp_path):
+    text = json.dumps({"locations": {"L": {"S": {"N": [f"{i}-1" for i in range(500)]}}}})
+    progress = []
+    load_inventory_stream(write(tmp_path, text), lambda done, total: progress.append((done, total)),
+                          chunk_size=256)
+
+    assert progress[-1] == (len(text), len(text))
+    assert [done for done, total in progress] == sorted(done for done, total in progress)
@@ -0,0 +1,164 @@
+import os
+import time
+
+import pytest
+
+from file_management.file_manager import InventoryManager
+from file_management import lookup_file
+from file_management.lookup_file import LookupFile, LookupPublisher, publish_lookup_file, write_lookup_file
+
+INDEX = {
+    "1234567890-1": ("Warehouse", "Shelf 1", "Bin A"),
+    "1234567890-10": ("Warehouse", "Shelf 1", "Bin B"),
+    "1234567890-2": ("Warehouse", "Shelf 1", "Bin A"),
+    "1234567891-1": ("Störe", "Shelf 2", "Bin A"),
+    "\ud800-1": ("Odd", "S", "N"),
+}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def lookup_path(tmp_path):
+    return str(tmp_path / "inventory.lookup")
+
+
+def test_lookup_matches_index(lookup_path):
+    write_lookup_file(lookup_path, INDEX.items())
+    lookup = LookupFile(lookup_path)
+
+    assert lookup.refresh()
+    assert len(lookup) == len(INDEX)
+    for barcode, path in INDEX.items():
+        assert lookup.get(barcode) == path
+    assert lookup.get("1234567890") is None
+    assert lookup.get("9-9", "missing") == "missing"
+
+
+def test_lines_for_order_in_natural_order(lookup_path):
+    write_lookup_file(lookup_path, INDEX.items())
+    lookup = LookupFile(lookup_path)
+    lookup.refresh()
+
+    assert lookup.lines_for_order("1234567890") == ["1", "2", "10"]
+    assert lookup.lines_for_order("123456789") == []
+
+
+def test_empty_and_missing_files(lookup_path):
+    lookup = LookupFile(lookup_path)
+    assert not lookup.refresh()
+    assert lookup.error
+
+    write_lookup_file(lookup_path, [])
+    assert lookup.refresh()
+    assert lookup.get("1-1") is None
+
+
+def test_refresh_picks_up_a_replaced_file(lookup_path):
+    write_lookup_file(lookup_path, INDEX.items())
+    lookup = LookupFile(lookup_path)
+    lookup.refresh()
+
+    write_lookup_file(lookup_path, [("5-5", ("New", "S", "N"))])
+    assert lookup.refresh()
+    assert lookup.get("5-5") == ("New", "S", "N")
+    assert lookup.get("1234567890-1") is None
+
+
+def test_refresh_rejects_other_files(lookup_path):
+    with open(lookup_path, 'wb') as file:
+        file.write(b"not a lookup file at all, just some bytes")
+    lookup = LookupFile(lookup_path)
+
+    assert not lookup.refresh()
+    assert lookup.error
+
+
+def test_publisher_recovers_after_a_failed_write(tmp_path, lookup_path):
+    errors = []
+    publisher = LookupPublisher(str(tmp_path / "missing" / "inventory.lookup"), on_error=errors.append,
+                                quiet_period=0.0)
+    publisher.publish(INDEX)
+    wait_for(lambda: errors)
+
+    publisher.path = lookup_path
+    publisher.publish(INDEX)
+    wait_for(lambda: os.path.exists(lookup_path) and publisher.error is None)
+    lookup = LookupFile(lookup_path)
+    lookup.refresh()
+    assert len(lookup) == len(INDEX)
+
+
+def data_files(lookup_path):
+    directory, base_name = os.path.split(lookup_path)
+    return sorted(name for name in os.listdir(directory)
+                  if name.startswith(base_name + ".") and name[len(base_name) + 1:].isdigit())
+
+
+def test_publish_swaps_the_pointer_and_keeps_old_mappings_readable(lookup_path):
+    publish_lookup_file(lookup_path, INDEX.items())
+    lookup = LookupFile(lookup_path)
+    assert lookup.refresh()
+    old_files = data_files(lookup_path)
+    assert len(old_files) == 1
+
+    publish_lookup_file(lookup_path, [("5-5", ("New", "S", "N"))])
+    # The reader keeps its mapping of the old version until it refreshes
+    assert lookup.get("1234567890-1") == ("Warehouse", "Shelf 1", "Bin A")
+    assert lookup.refresh()
+    assert lookup.get("5-5") == ("New", "S", "N")
+    assert lookup.get("1234567890-1") is None
+    assert len(data_files(lookup_path)) == 1
+    assert data_files(lookup_path) != old_files
+
+
+def test_publish_leaves_versions_it_cannot_remove_for_later(monkeypatch, lookup_path):
+    publish_lookup_file(lookup_path, INDEX.items())
+
+    def refuse(path):
+        # Windows refuses to delete a file another process still has mapped
+        raise PermissionError(13, "The process cannot access the file", path)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(lookup_file.os, "remove", refuse)
+        publish_lookup_file(lookup_path, [("5-5", ("New", "S", "N"))])
+    assert len(data_files(lookup_path)) == 2
+    lookup = LookupFile(lookup_path)
+    assert lookup.refresh()
+    assert lookup.get("5-5") == ("New", "S", "N")
+
+    publish_lookup_file(lookup_path, [("6-6", ("New", "S", "N"))])
+    assert len(data_files(lookup_path)) == 1
+
+
+def test_publisher_coalesces_a_burst_of_saves(monkeypatch, lookup_path):
+    written = []
+    monkeypatch.setattr(lookup_file, "publish_lookup_file", lambda path, entries: written.append(entries))
+    publisher = LookupPublisher(lookup_path, quiet_period=0.2)
+    index = {}
+    for number in range(5):
+        index[f"1-{number}"] = ("L", "S", "N")
+        publisher.publish(index)
+    assert written == []
+
+    publisher.flush(timeout=5)
+    assert len(written) == 1
+    assert len(written[0]) == 5
+
+
+def test_inventory_saves_publish_the_lookup_file(tmp_path, lookup_path):
+    inventory = InventoryManager(str(tmp_path / "inventory.json"), lookup_path=lookup_path)
+    inventory.load()
+    inventory.add_location("L")
+    inventory.add_shelf("L", "S")
+    inventory.add_nested_shelf("L", "S", "N")
+    inventory.add_item("L", "S", "N", "7-1")
+    inventory.save()
+
+    lookup = LookupFile(lookup_path)
+    wait_for(lambda: lookup.refresh() and lookup.get("7-1") == ("L", "S", "N"))
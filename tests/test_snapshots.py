@@ -0,0 +1,79 @@
+import copy
+import os
+
+import pytest
+
+from file_management.file_manager import InventoryManager
+from file_management.snapshots import SnapshotError, SnapshotManager
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    inventory = InventoryManager(str(tmp_path / "inventory.json"))
+    inventory.load()
+    for location_name in ("A", "B", "C"):
+        inventory.add_location(location_name)
+        inventory.add_shelf(location_name, "S")
+        inventory.add_nested_shelf(location_name, "S", "N")
+        inventory.add_item(location_name, "S", "N", f"{location_name}-1")
+    return inventory
+
+
+def take(snapshots, inventory):
+    return snapshots.write(snapshots.prepare(inventory))
+
+
+def test_incremental_chain_restores_every_state(tmp_path, inventory):
+    snapshots = SnapshotManager(str(tmp_path / "backups"))
+    states = {}
+    states[take(snapshots, inventory)] = copy.deepcopy(inventory.data)
+
+    inventory.add_item("B", "S", "N", "A-1")
+    states[take(snapshots, inventory)] = copy.deepcopy(inventory.data)
+
+    inventory.remove_location("C")
+    inventory.add_location("D")
+    states[take(snapshots, inventory)] = copy.deepcopy(inventory.data)
+
+    names = snapshots.list_snapshots()
+    assert [name.endswith("-full.json.gz") for name in names] == [True, False, False]
+    for name, data in states.items():
+        restored = snapshots.load(name)
+        assert restored == data
+        assert list(restored["locations"]) == list(data["locations"])
+
+
+def test_increments_only_store_changed_locations(tmp_path, inventory):
+    snapshots = SnapshotManager(str(tmp_path / "backups"))
+    take(snapshots, inventory)
+    inventory.add_item("A", "S", "N", "A-2")
+
+    payload = snapshots.prepare(inventory)
+    assert payload["kind"] == "incremental"
+    assert list(payload["locations"]) == ["A"]
+
+
+def test_rotation_deletes_whole_chains(tmp_path, inventory):
+    snapshots = SnapshotManager(str(tmp_path / "backups"), max_snapshots=4, full_every=2)
+    for i in range(9):
+        inventory.add_item("A", "S", "N", f"A-{i + 2}")
+        take(snapshots, inventory)
+
+    names = snapshots.list_snapshots()
+    assert len(names) <= 4
+    assert names[0].endswith("-full.json.gz")
+    for name in names:
+        snapshots.load(name)
+
+
+def test_missing_base_snapshot_raises(tmp_path, inventory):
+    snapshots = SnapshotManager(str(tmp_path / "backups"))
+    take(snapshots, inventory)
+    inventory.add_item("A", "S", "N", "A-2")
+    take(snapshots, inventory)
+    inventory.add_item("A", "S", "N", "A-3")
+    last = take(snapshots, inventory)
+
+    os.remove(os.path.join(snapshots.directory, snapshots.list_snapshots()[1]))
+    with pytest.raises(SnapshotError):
+        snapshots.load(last)
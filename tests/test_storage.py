@@ -0,0 +1,116 @@
+import json
+import os
+
+import pytest
+
+from file_management.inventory_loader import InventoryFormatError
+from file_management.storage import JOURNAL_NAME, MANIFEST_NAME, JsonFileStore, ShardedStore
+
+DATA = {
+    "version": 2,
+    "locations": {
+        "Warehouse": {"Shelf 1": {"Bin A": ["1-1", "1-2"], "Bin B": []}},
+        "Store/Front": {"Shelf 1": {"Bin A": ["2-1"]}},
+        "Empty": {},
+    },
+}
+
+
+def shard_path(store, location_name):
+    return os.path.join(store.path, store.manifest["locations"][location_name])
+
+
+def test_json_file_store_round_trip(tmp_path):
+    store = JsonFileStore(str(tmp_path / "inventory.json"))
+    store.write(DATA)
+
+    assert store.read().data == DATA
+
+
+def test_sharded_store_round_trip_keeps_location_order(tmp_path):
+    store = ShardedStore(str(tmp_path / "inventory"))
+    store.write(DATA)
+
+    data = ShardedStore(store.path).read().data
+    assert data == DATA
+    assert list(data["locations"]) == list(DATA["locations"])
+
+
+def test_sharded_store_rewrites_only_changed_shards(tmp_path):
+    store = ShardedStore(str(tmp_path / "inventory"))
+    store.write(DATA)
+    os.utime(shard_path(store, "Store/Front"), (0, 0))
+
+    data = json.loads(json.dumps(DATA))
+    data["locations"]["Warehouse"]["Shelf 1"]["Bin B"].append("1-3")
+    store.write(data, {"Warehouse"})
+
+    assert os.path.getmtime(shard_path(store, "Store/Front")) == 0
+    assert ShardedStore(store.path).read().data == data
+
+
+def test_sharded_store_removes_deleted_location_shard(tmp_path):
+    store = ShardedStore(str(tmp_path / "inventory"))
+    store.write(DATA)
+    removed_path = shard_path(store, "Empty")
+
+    data = json.loads(json.dumps(DATA))
+    del data["locations"]["Empty"]
+    store.write(data, {"Empty"})
+
+    assert not os.path.exists(removed_path)
+    assert ShardedStore(store.path).read().data == data
+
+
+def test_recover_finishes_an_interrupted_commit(tmp_path):
+    store = ShardedStore(str(tmp_path / "inventory"))
+    store.write(DATA)
+
+    # Simulate a crash after the journal was written but before any rename
+    moved = {"Shelf 1": {"Bin A": ["1-2"], "Bin B": []}}
+    front = {"Shelf 1": {"Bin A": ["2-1", "1-1"]}}
+    renames = []
+    for location_name, shelves in (("Warehouse", moved), ("Store/Front", front)):
+        file_name = store.manifest["locations"][location_name]
+        with open(os.path.join(store.path, file_name + ".tmp"), 'w') as file:
+            json.dump(shelves, file)
+        renames.append(file_name)
+    with open(os.path.join(store.path, JOURNAL_NAME), 'w') as file:
+        json.dump({"renames": renames, "deletes": []}, file)
+
+    data = ShardedStore(store.path).read().data
+    assert data["locations"]["Warehouse"] == moved
+    assert data["locations"]["Store/Front"] == front
+    assert sorted(os.listdir(store.path)) == sorted([MANIFEST_NAME] + list(store.manifest["locations"].values()))
+
+
+def test_recover_discards_uncommitted_temp_files(tmp_path):
+    store = ShardedStore(str(tmp_path / "inventory"))
+    store.write(DATA)
+    with open(shard_path(store, "Warehouse") + ".tmp", 'w') as file:
+        json.dump({}, file)
+
+    assert ShardedStore(store.path).read().data == DATA
+    assert not os.path.exists(shard_path(store, "Warehouse") + ".tmp")
+
+
+def test_recover_discards_a_torn_journal(tmp_path):
+    store = ShardedStore(str(tmp_path / "inventory"))
+    store.write(DATA)
+    with open(shard_path(store, "Warehouse") + ".tmp", 'w') as file:
+        json.dump({}, file)
+    with open(os.path.join(store.path, JOURNAL_NAME), 'w') as file:
+        file.write('{"renames": ["War')
+
+    assert ShardedStore(store.path).read().data == DATA
+    assert not os.path.exists(os.path.join(store.path, JOURNAL_NAME))
+
+
+def test_corrupt_manifest_raises_format_error(tmp_path):
+    store = ShardedStore(str(tmp_path / "inventory"))
+    store.write(DATA)
+    with open(store.manifest_path, 'w') as file:
+        file.write("{not json")
+
+    with pytest.raises(InventoryFormatError):
+        ShardedStore(store.path).read()
@@ -0,0 +1,45 @@
+from modules.utils import parse_pick_list, plan_pick_route
+
+INDEX = {
+    "1234567890-1": ("Warehouse", "Shelf 10", "Bin A"),
+    "1234567890-2": ("Warehouse", "Shelf 2", "Bin B"),
+    "1234567890-10": ("Warehouse", "Shelf 2", "Bin B"),
+    "1234567891-1": ("Annex", "Shelf 1", "Bin A"),
+}
+
+
+def test_parse_pick_list_takes_the_first_column():
+    text = "1234567890-1, 2 pcs\n1234567890-2;note\n\t\n  1234567891-1\t5\n\n1234567890-1\n"
+
+    assert parse_pick_list(text) == ["1234567890-1", "1234567890-2", "1234567891-1", "1234567890-1"]
+
+
+def test_parse_pick_list_of_blank_text_is_empty():
+    assert parse_pick_list("") == []
+    assert parse_pick_list("\n , \n;\n") == []
+
+
+def test_plan_pick_route_orders_stops_naturally():
+    barcodes = ["1234567890-1", "1234567890-10", "1234567891-1", "1234567890-2"]
+
+    route, not_found = plan_pick_route(barcodes, INDEX)
+
+    assert route == [
+        (("Annex", "Shelf 1", "Bin A"), ["1234567891-1"]),
+        (("Warehouse", "Shelf 2", "Bin B"), ["1234567890-2", "1234567890-10"]),
+        (("Warehouse", "Shelf 10", "Bin A"), ["1234567890-1"]),
+    ]
+    assert not_found == []
+
+
+def test_plan_pick_route_skips_duplicates_and_keeps_misses_in_order():
+    barcodes = ["9-2", "1234567890-1", "9-1", "1234567890-1", "9-2"]
+
+    route, not_found = plan_pick_route(barcodes, INDEX)
+
+    assert route == [(("Warehouse", "Shelf 10", "Bin A"), ["1234567890-1"])]
+    assert not_found == ["9-2", "9-1"]
+
+
+def test_plan_pick_route_of_nothing_is_empty():
+    assert plan_pick_route([], INDEX) == ([], [])